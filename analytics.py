@@ -0,0 +1,184 @@
+"""Roster analytics: hours of every activity per day and week, sleep debt, longest awake span and rest between shifts."""
+import argparse
+import csv
+import os
+from itertools import islice
+
+import numpy as np
+
+from batch_render import find_configs
+from team_coverage import encode_week, load_configs
+from schedule_raster import DAYS_OF_WEEK, MINUTES_PER_DAY, build_vocabulary
+
+METRICS = ["sleep debt", "longest awake", "shifts", "min rest", "mean rest", "short rests"]
+
+
+def activity_minutes(codes, n_activities, slot_minutes):
+    """(n, days, activities) minutes of every activity per day of an (n, days, slots) code array."""
+    n, days, slots = codes.shape
+    # Every (person, day, activity) triple gets one bin, so a single bincount sums all of them
+    cells = np.arange(n * days, dtype=np.int64)[:, None] * n_activities + codes.reshape(n * days, slots)
+    return np.bincount(cells.ravel(), minlength=n * days * n_activities).reshape(n, days, n_activities) * slot_minutes
+
+
+def longest_run(mask, wrap=True):
+    """Length in slots of the longest run of True in every row of an (n, slots) mask.
+
+    With wrap, each row repeats (a weekly schedule), so a run can continue from the end of the row into its start.
+    """
+    n, slots = mask.shape
+    index = np.arange(slots, dtype=np.int32)
+    # Slots since the last False is the length of the run ending at each slot
+    last_false = np.maximum.accumulate(np.where(mask, -1, index), axis=1)
+    longest = (index - last_false).max(axis=1)
+    if wrap:
+        # The run at the end of the row carries on into the run at its start; a row without False is one endless run
+        head = np.where(mask.all(axis=1), slots, np.argmin(mask, axis=1))
+        longest = np.minimum(np.maximum(longest, head + slots - 1 - last_false[:, -1]), slots)
+    return longest
+
+
+def rest_gaps(work, min_rest_slots, wrap=True):
+    """(shifts, shortest gap, mean gap, gaps under min_rest_slots) between the shifts in every row of an (n, slots) mask.
+
+    A shift is a run of work; the gap is from its end to the start of the next one. Rows without a gap get NaN.
+    """
+    n, slots = work.shape
+    previous = np.roll(work, 1, axis=1) if wrap else np.pad(work[:, :-1], ((0, 0), (1, 0)))
+    starts = work & ~previous
+    ends = ~work & previous
+    shifts = starts.sum(axis=1)
+
+    index = np.arange(slots, dtype=np.int32)
+    last_end = np.maximum.accumulate(np.where(ends, index, -1), axis=1)
+    if wrap:
+        # Before the first end of the row, the last shift ended in the week before
+        last_end = np.where(last_end >= 0, last_end, last_end[:, -1:] - slots)
+        valid = starts & ends.any(axis=1, keepdims=True)
+    else:
+        valid = starts & (last_end >= 0)
+    gaps = np.where(valid, index - last_end, 0)
+
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        shortest = np.where(count > 0, np.where(valid, gaps, np.iinfo(np.int32).max).min(axis=1), np.nan)
+        mean = gaps.sum(axis=1) / count
+    short = (valid & (gaps < min_rest_slots)).sum(axis=1)
+    return shifts, shortest, mean, short
+
+
+def analyze(codes, vocabulary, slot_minutes=1, sleep_activity="asleep", work_activity="work", target_hours=8,
+            min_rest_hours=11, wrap=True):
+    """All statistics of an (n, days, slots) code array, one row per person. Durations are in minutes.
+
+    Returns {"minutes": (n, days, activities) array, metric: (n,) array for every name in METRICS}.
+    With wrap, the days repeat (a weekly config), so awake spans and rest gaps carry over from the last day to the first.
+    """
+    codes = np.asarray(codes)
+    n, days, slots = codes.shape
+    minutes = activity_minutes(codes, len(vocabulary), slot_minutes)
+    # An activity missing from the vocabulary never matches
+    sleep_code = vocabulary.index(sleep_activity) if sleep_activity in vocabulary else -1
+    work_code = vocabulary.index(work_activity) if work_activity in vocabulary else -1
+
+    timeline = codes.reshape(n, days * slots)
+    slept = minutes[..., sleep_code].sum(axis=1) if sleep_code >= 0 else np.zeros(n, dtype=np.int64)
+    shifts, shortest, mean, short = rest_gaps(timeline == work_code, min_rest_hours * 60 / slot_minutes, wrap)
+    return {
+        "minutes": minutes,
+        "sleep debt": target_hours * 60 * days - slept,
+        "longest awake": longest_run(timeline != sleep_code, wrap) * slot_minutes,
+        "shifts": shifts,
+        "min rest": shortest * slot_minutes,
+        "mean rest": mean * slot_minutes,
+        "short rests": short,
+    }
+
+
+def analyze_configs(configs, vocabulary=None, chunk_size=1000, slot_minutes=1, **options):
+    """Statistics of the repeating week of many configs, chunk_size configs at a time. Options go to analyze.
+
+    Returns (statistics, vocabulary). Activities missing from the vocabulary are appended as they are found.
+    """
+    vocabulary = list(vocabulary or build_vocabulary([]))
+    chunks = []
+    configs = iter(configs)
+
+    while chunk := list(islice(configs, chunk_size)):
+        interval_lists = [schedule['intervals'] for config in chunk for schedule in config['schedule_patterns']]
+        vocabulary = build_vocabulary(interval_lists, dict.fromkeys(vocabulary))
+        chunks.append(analyze(encode_week(chunk, vocabulary, slot_minutes), vocabulary, slot_minutes, wrap=True, **options))
+
+    # Earlier chunks have no minutes for activities found later
+    for statistics in chunks:
+        statistics["minutes"] = np.pad(statistics["minutes"], ((0, 0), (0, 0), (0, len(vocabulary) - statistics["minutes"].shape[2])))
+    if not chunks:
+        return analyze(np.zeros((0, len(DAYS_OF_WEEK), MINUTES_PER_DAY // slot_minutes), dtype=np.int8), vocabulary, slot_minutes, **options), vocabulary
+    return {name: np.concatenate([statistics[name] for statistics in chunks]) for name in chunks[0]}, vocabulary
+
+
+def analyze_horizon(horizon, **options):
+    """Statistics of one person over every week of a HorizonScheduler, without wrapping from the last day to the first.
+
+    Returns (statistics, day labels).
+    """
+    weeks = list(horizon.iter_weeks())
+    codes = np.concatenate([week.codes for week in weeks])[None]
+    days = [date.isoformat() for week in weeks for date in week.dates]
+    return analyze(codes, horizon.vocabulary, MINUTES_PER_DAY // codes.shape[2], wrap=False, **options), days
+
+
+def save_analytics_csv(names, statistics, vocabulary, filename="results/analytics.csv", days=None):
+    """Save one row per person: hours of each activity per week and per day, then the other metrics (hours, or counts)."""
+    days = days or DAYS_OF_WEEK
+    minutes = statistics["minutes"]
+    weeks = minutes.shape[1] // 7
+    activities = [code for code, activity in enumerate(vocabulary) if minutes[..., code].any()]
+    week_labels = ["week"] if weeks == 1 else [f"week {week + 1}" for week in range(weeks)]
+    weekly = minutes[:, :weeks * 7].reshape(len(names), weeks, 7, -1).sum(axis=2)
+
+    header = ["config"]
+    header += [f"{vocabulary[code]} h/{label}" for code in activities for label in week_labels]
+    header += [f"{vocabulary[code]} h {day}" for code in activities for day in days]
+    header += [f"{metric} h" if metric not in ("shifts", "short rests") else metric for metric in METRICS]
+
+    # Hours for everything measured in minutes, rounded once for the whole table
+    columns = [weekly[:, :, activities].transpose(0, 2, 1).reshape(len(names), -1) / 60,
+               minutes[:, :, activities].transpose(0, 2, 1).reshape(len(names), -1) / 60]
+    columns += [(statistics[metric] if metric in ("shifts", "short rests") else statistics[metric] / 60).reshape(-1, 1)
+                for metric in METRICS]
+    table = np.round(np.hstack(columns).astype(float), 2)
+
+    with open(filename, 'w', encoding='UTF-8', newline='') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(header)
+        for name, row in zip(names, table.tolist()):
+            writer.writerow([name] + ["" if value != value else f"{value:g}" for value in row])
+    print(f'Saved analytics to CSV at {filename}.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="+", help="config directories, config files or manifests")
+    parser.add_argument("-o", "--output", default="results/analytics.csv", help="CSV with one row per config")
+    parser.add_argument("--slot-minutes", type=int, default=1, help="resolution of the encoded week (default: exact minutes)")
+    parser.add_argument("--sleep", default="asleep", help="activity counted as sleep; every other one is awake")
+    parser.add_argument("--work", default="work", help="activity counted as a shift")
+    parser.add_argument("--target-hours", type=float, default=8, help="sleep per day the sleep debt is measured against")
+    parser.add_argument("--min-rest-hours", type=float, default=11, help="rest gaps shorter than this are counted as short")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="configs encoded per chunk")
+    args = parser.parse_args(argv)
+
+    config_paths = find_configs(args.sources)
+    assert config_paths, "Error: No config files found."
+
+    colors = next(load_configs(config_paths[:1]))['colors']
+    statistics, vocabulary = analyze_configs(load_configs(config_paths), build_vocabulary([], colors), args.chunk_size,
+                                             args.slot_minutes, sleep_activity=args.sleep, work_activity=args.work,
+                                             target_hours=args.target_hours, min_rest_hours=args.min_rest_hours)
+    print(f'Analyzed {len(config_paths)} schedules.')
+    save_analytics_csv(config_paths, statistics, vocabulary, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Render the schedule sheet and clock plots of a whole roster of config files without opening any windows."""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import render_cache
+import tracing
+
+
+def available_cores():
+    """Number of cores this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def find_configs(sources):
+    """Expand directories and manifests (.txt with one path per line, or a JSON list) into config paths."""
+    configs = []
+    for source in sources:
+        if os.path.isdir(source):
+            configs.extend(sorted(os.path.join(source, name) for name in os.listdir(source) if name.endswith(".json")))
+            continue
+
+        base = os.path.dirname(source)
+        if source.endswith(".txt"):
+            with open(source, 'r', encoding='UTF-8') as f:
+                entries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        else:
+            with open(source, 'r', encoding='UTF-8') as f:
+                data = json.load(f)
+            # A JSON list is a manifest, anything else is a config file itself
+            if not isinstance(data, list):
+                configs.append(source)
+                continue
+            entries = data
+
+        configs.extend(entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries)
+    return configs
+
+
+def output_names(config_paths):
+    """Unique output folder name for every config, based on the file name."""
+    names, seen = [], {}
+    for path in config_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f"{stem}-{seen[stem]}")
+    return names
+
+
+def init_worker():
+    """Force the non-interactive backend in every worker process."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_config(config_path, output_dir, sheet=True, clock=True):
+    """Render all images for one config into output_dir. Returns the number of images written."""
+    from scheduler_sheet import SheetScheduler
+    from scheduler_clock_plot import SchedulePlotter
+
+    os.makedirs(output_dir, exist_ok=True)
+    images = 0
+
+    # Keep the per-image progress prints of the schedulers out of the batch report
+    with contextlib.redirect_stdout(io.StringIO()), tracing.span("batch.render_config", path=config_path):
+        if sheet:
+            scheduler = SheetScheduler(config_path)
+            scheduler.save_to_png(os.path.join(output_dir, "schedule-sheet.png"))
+            scheduler.save_to_csv(os.path.join(output_dir, "schedule-sheet.csv"))
+            images += 1
+
+        if clock:
+            plotter = SchedulePlotter(True, output_dir=output_dir, show=False)
+            plotter.load_schedule_data(file_path=config_path)
+            plotter.plot_all_schedules()
+            plotter.close()
+            images += len(plotter.schedule_data)
+
+    return images
+
+
+def worker_render_config(*args):
+    """render_config for a worker process, also returning its trace events and render cache counts."""
+    return render_config(*args), tracing.take_events(), render_cache.take_stats()
+
+
+def render_roster(config_paths, output_dir, jobs=None, sheet=True, clock=True):
+    """Render every config across a process pool. Returns (images, failures, seconds)."""
+    jobs = jobs or available_cores()
+    images, failures = 0, {}
+
+    # Children inherit this before they import matplotlib, so no process can pick an interactive backend
+    os.environ["MPLBACKEND"] = "Agg"
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(worker_render_config, path, os.path.join(output_dir, name), sheet, clock): path
+            for path, name in zip(config_paths, output_names(config_paths))
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                rendered, events, cache_stats = future.result()
+                images += rendered
+                tracing.add_events(events)
+                render_cache.add_stats(cache_stats)
+            except Exception as e:
+                failures[path] = f"{type(e).__name__}: {e}"
+            print(f'Rendered {done} of {len(futures)}', end='\r')
+
+    print()
+    return images, failures, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="+", help="config directories, config files or manifests")
+    parser.add_argument("-o", "--output-dir", default="results/batch", help="root folder for the rendered files")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: available cores)")
+    parser.add_argument("--no-sheet", action="store_true", help="skip the weekly schedule sheets")
+    parser.add_argument("--no-clock", action="store_true", help="skip the clock plots")
+    parser.add_argument("--trace", default=None, help="save a Chrome trace of every render stage to this JSON")
+    parser.add_argument("--render-cache-mb", type=float, default=None, help="size limit of the render cache, 0 to turn it off")
+    args = parser.parse_args(argv)
+    if args.render_cache_mb is not None:
+        # Workers read the limit from the environment when they import the cache
+        os.environ["SCHEDULE_RENDER_CACHE_MB"] = str(args.render_cache_mb)
+        render_cache.MAX_BYTES = int(args.render_cache_mb * 1024 * 1024)
+    if args.trace:
+        tracing.enable(args.trace)
+
+    config_paths = find_configs(args.sources)
+    assert config_paths, "Error: No config files found."
+
+    images, failures, seconds = render_roster(config_paths, args.output_dir, args.jobs,
+                                              sheet=not args.no_sheet, clock=not args.no_clock)
+
+    print(f'Rendered {images} images from {len(config_paths) - len(failures)} of {len(config_paths)} configs '
+          f'in {seconds:.1f}s ({images / seconds:.1f} images/s).')
+    cache_stats = render_cache.stats()
+    print(f'Render cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses, {cache_stats["evictions"]} evictions.')
+    for path, error in failures.items():
+        print(f'Failed {path}: {error}')
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Compare the batched NumPy rasterizer with the original per-slot loop."""
+import argparse
+import timeit
+
+from synthetic import synthetic_configs
+from schedule_raster import build_vocabulary, decode, rasterize
+
+
+def legacy_activity_list(intervals):
+    """The original SheetScheduler.generate_activity_list loop, kept as the reference.
+
+    Wrapping past midnight is decided on the exact minutes, as rasterize does, so an interval within one slot stays empty.
+    """
+    def time_to_minutes(time):
+        return int(time[:2]) * 60 + int(time[2:])
+
+    activity_list = ["empty"] * 48
+
+    for interval in intervals:
+        start_minute = time_to_minutes(interval["start"])
+        end_minute = time_to_minutes(interval["end"])
+        start_index = start_minute // 30
+        end_index = end_minute // 30
+
+        if end_minute <= start_minute:
+            end_index += 48
+
+        for i in range(start_index, end_index):
+            activity_list[i % 48] = interval["id"]
+
+    return activity_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--configs", type=int, default=2000, help="number of synthetic configs")
+    parser.add_argument("--intervals", type=int, default=6, help="intervals per pattern")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    configs = synthetic_configs(args.configs, args.intervals)
+    interval_lists = [p["intervals"] for config in configs for p in config["schedule_patterns"]]
+    vocabulary = build_vocabulary(interval_lists)
+
+    expected = [legacy_activity_list(intervals) for intervals in interval_lists]
+    assert decode(rasterize(interval_lists, vocabulary), vocabulary) == expected, "Error: Rasterizer output differs."
+
+    legacy = min(timeit.repeat(lambda: [legacy_activity_list(i) for i in interval_lists], number=1, repeat=args.repeat))
+    batched = min(timeit.repeat(lambda: rasterize(interval_lists, vocabulary), number=1, repeat=args.repeat))
+
+    print(f"{len(interval_lists)} patterns x {args.intervals} intervals")
+    print(f"Per-slot loop:      {legacy * 1000:8.1f} ms")
+    print(f"Batched rasterizer: {batched * 1000:8.1f} ms ({legacy / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
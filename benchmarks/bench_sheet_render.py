@@ -0,0 +1,37 @@
+"""Compare the per-run sheet plot with the batched-artist fast path at 300 dpi."""
+import argparse
+import os
+import sys
+import timeit
+
+import matplotlib
+matplotlib.use("Agg")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import render_cache
+from scheduler_sheet import SheetScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default=os.path.join(ROOT, "config-files", "example-config.json"))
+    parser.add_argument("--output", default=os.path.join(ROOT, "results", "bench-schedule-sheet.png"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    # Time real renders; a render cache hit would only time linking the file into place
+    render_cache.MAX_BYTES = 0
+    scheduler = SheetScheduler(args.config)
+
+    per_run = min(timeit.repeat(lambda: scheduler.plot_schedule(save_path=args.output), number=1, repeat=args.repeat))
+    fast = min(timeit.repeat(lambda: scheduler.plot_schedule(save_path=args.output, fast=True), number=1, repeat=args.repeat))
+
+    print(f"Per-run artists: {per_run * 1000:8.1f} ms")
+    print(f"Fast path:       {fast * 1000:8.1f} ms ({per_run / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time module imports in fresh subprocesses and check that heavy dependencies stay lazy."""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["numpy", "pandas", "matplotlib"]
+
+# Module to import, and the heavy dependencies it must not load at import time
+TARGETS = {
+    "gui": ["numpy", "pandas", "matplotlib"],
+    "scheduler_sheet": ["pandas", "matplotlib"],
+    "scheduler_clock_plot": ["pandas", "matplotlib"],
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    """Best import time of `module` over `repeat` fresh interpreters, plus the heavy modules it loaded."""
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), runs[0]["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if any import takes longer than this")
+    args = parser.parse_args()
+
+    failed = False
+    for module, forbidden in TARGETS.items():
+        try:
+            seconds, loaded = measure(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            # A module that no longer imports is the worst startup regression of all
+            failed = True
+            error = e.stderr.strip().splitlines()
+            print(f"{module:22} import failed ({error[-1] if error else f'exit code {e.returncode}'}) FAIL")
+            continue
+
+        eager = [m for m in loaded if m in forbidden]
+        too_slow = args.max_ms is not None and seconds * 1000 > args.max_ms
+        failed |= bool(eager) or too_slow
+        status = "FAIL" if eager or too_slow else "ok"
+        print(f"{module:22} {seconds * 1000:8.1f} ms  loads: {', '.join(loaded) or '-':28} {status}")
+        if eager:
+            print(f"{'':22} imports {', '.join(eager)} eagerly")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Load test for render_service.py: p50/p99 latency and throughput under concurrent requests.
+
+    python benchmarks/load_test.py --start-server --requests 200 --concurrency 16 --unique 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from synthetic import synthetic_configs
+
+HOST = "127.0.0.1"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def post(reader, writer, path, body):
+    """Send one keep-alive POST and return (status, body)."""
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').rstrip("\r\n").split("\r\n")
+    headers = {name.strip().lower(): value.strip() for name, value in (line.split(":", 1) for line in header_lines)}
+    return int(status_line.split()[1]), await reader.readexactly(int(headers["content-length"]))
+
+
+async def client(port, path, bodies, latencies, statuses):
+    """One connection sending its share of the requests back to back."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            status, _ = await post(reader, writer, path, body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def wait_for_server(port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(HOST, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    # `unique` distinct configs, cycled, so repeated ones can be coalesced by the service (or hit its render cache)
+    configs = [json.dumps(config).encode() for config in synthetic_configs(args.unique, seed=args.seed)]
+    bodies = [configs[i % len(configs)] for i in range(args.requests)]
+    path = args.path
+
+    await wait_for_server(args.port)
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.port, path, bodies[i::args.concurrency], latencies, statuses)
+                           for i in range(args.concurrency)))
+    seconds = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    print(f"{len(latencies)} requests to {path} over {args.concurrency} connections in {seconds:.2f}s "
+          f"({len(latencies) / seconds:.1f} requests/s)")
+    print(f"latency p50 {percentiles[49] * 1000:.1f} ms, p99 {percentiles[98] * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+    print("status " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--port", type=int, default=8765)
+    parser.add_argument("--path", default="/sheet.png", help="endpoint to load, e.g. /sheet.csv or /sheet.json")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--unique", type=int, default=20, help="distinct configs among the requests")
+    parser.add_argument("--seed", type=int, default=0, help="change it to get configs the render cache has not seen")
+    parser.add_argument("--start-server", action="store_true", help="run render_service.py for the duration of the test")
+    parser.add_argument("--queue-limit", type=int, default=64, help="queue limit of a started server")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "render_service.py"),
+                                   "--port", str(args.port), "--queue-limit", str(args.queue_limit)])
+    try:
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Benchmark suite for the computation, rendering and export hot paths.
+
+    python benchmarks/run_benchmarks.py run -o results/bench.json
+    python benchmarks/run_benchmarks.py compare results/bench-old.json results/bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from synthetic import synthetic_configs
+from matplotlib.figure import Figure
+
+import config_cache
+import render_cache
+from analytics import analyze_configs
+from team_coverage import count_coverage
+from scheduler_clock_plot import SchedulePlotter
+from scheduler_sheet import SheetScheduler
+
+
+def write_configs(configs, folder):
+    """Write configs as JSON files and return their paths."""
+    paths = []
+    for i, config in enumerate(configs):
+        path = os.path.join(folder, f"config-{i:05}.json")
+        with open(path, 'w', encoding='UTF-8') as f:
+            json.dump(config, f)
+        paths.append(path)
+    return paths
+
+
+def case_key(name, params):
+    """Name of a benchmark in the results, e.g. "sheet.plot_schedule[fast=True]"."""
+    return name + "".join(f"[{k}={v}]" for k, v in params.items())
+
+
+def cases(folder, quick, wanted=lambda key: True):
+    """Yield (key, function) for every benchmark whose key is wanted; the others are not even set up."""
+    scale = 0.1 if quick else 1
+    # Time real renders; the cache gets its own cases below
+    render_cache.MAX_BYTES = 0
+    # Compile into a private cache, so the cold cases never wipe the real one
+    config_cache.CACHE_DIR = os.path.join(folder, "compiled-configs")
+
+    for n_intervals in (5, 50):
+        key = case_key("sheet.generate_activity_list", {"intervals": n_intervals})
+        if wanted(key):
+            path, = write_configs(synthetic_configs(1, n_intervals, seed=n_intervals), folder)
+            scheduler = SheetScheduler(path)
+            intervals = scheduler.config['schedule_patterns'][0]['intervals']
+            yield key, lambda s=scheduler, i=intervals: s.generate_activity_list(i)
+
+    def compile_cold(path):
+        config_cache.clear_cache()
+        config_cache.compile_config(path)
+
+    def compile_disk(path):
+        config_cache.clear_cache(disk=False)
+        config_cache.compile_config(path)
+
+    for extra_patterns in (0, 200):
+        path = None
+        for cache, function in (("cold", compile_cold), ("disk", compile_disk), ("memory", config_cache.compile_config)):
+            key = case_key("config.compile_config", {"patterns": 6 + extra_patterns, "cache": cache})
+            if wanted(key):
+                path = path or write_configs(synthetic_configs(1, 6, extra_patterns, seed=extra_patterns), folder)[0]
+                yield key, lambda f=function, p=path: f(p)
+        for method in ("load_config", "generate_schedule_patterns"):
+            key = case_key(f"sheet.{method}", {"patterns": 6 + extra_patterns})
+            if wanted(key):
+                path = path or write_configs(synthetic_configs(1, 6, extra_patterns, seed=extra_patterns), folder)[0]
+                yield key, getattr(SheetScheduler(path), method)
+
+    scheduler = SheetScheduler(write_configs(synthetic_configs(1, 6, seed=1), folder)[0])
+    for fast in (False, True):
+        def draw(fast=fast):
+            fig = Figure(figsize=(12, 8), facecolor='darkgrey')
+            scheduler.plot_schedule(fast=fast, fig=fig)
+            fig.canvas.draw()
+        key = case_key("sheet.plot_schedule", {"fast": fast})
+        if wanted(key):
+            yield key, draw
+
+    png = os.path.join(folder, "schedule-sheet.png")
+    key = case_key("sheet.save_to_png", {"dpi": 300})
+    if wanted(key):
+        yield key, lambda: scheduler.save_to_png(png, fig=Figure(figsize=(12, 8), facecolor='darkgrey'))
+    key = case_key("sheet.save_to_csv", {})
+    if wanted(key):
+        yield key, lambda: scheduler.save_to_csv(os.path.join(folder, "schedule-sheet.csv"))
+
+    plotter = SchedulePlotter(True, output_dir=folder, show=False, figure=Figure(figsize=(8, 8), facecolor='darkgrey'))
+    plotter.load_schedule_data(scheduler.config_path)
+    title = next(iter(plotter.schedule_data))
+    key = case_key("clock.plot_schedule", {"dpi": 300})
+    if wanted(key):
+        yield key, lambda: plotter.plot_schedule(title, plotter.schedule_data[title])
+    key = case_key("clock.plot_all_schedules", {"patterns": len(plotter.schedule_data), "dpi": 300})
+    if wanted(key):
+        yield key, plotter.plot_all_schedules
+
+    render_cache.CACHE_DIR = os.path.join(folder, "render-cache")
+    render_cache.MAX_BYTES = 64 * 1024 * 1024
+    key = case_key("sheet.save_to_png", {"dpi": 300, "cache": "hit"})
+    if wanted(key):
+        yield key, lambda: scheduler.save_to_png(png)
+    key = case_key("clock.plot_all_schedules", {"patterns": len(plotter.schedule_data), "dpi": 300, "cache": "hit"})
+    if wanted(key):
+        cached_plotter = SchedulePlotter(True, output_dir=folder, show=False)
+        cached_plotter.load_schedule_data(scheduler.config_path)
+        yield key, cached_plotter.plot_all_schedules
+
+    for roster in (int(1000 * scale), int(10000 * scale)):
+        coverage_key = case_key("roster.count_coverage", {"configs": roster})
+        analytics_key = case_key("roster.analyze_configs", {"configs": roster, "slot_minutes": 1})
+        if not (wanted(coverage_key) or wanted(analytics_key)):
+            continue
+        configs = synthetic_configs(roster, 6, seed=roster)
+        if wanted(coverage_key):
+            yield coverage_key, lambda c=configs: count_coverage(c)
+        if wanted(analytics_key):
+            yield analytics_key, lambda c=configs: analyze_configs(c)
+
+
+def time_case(function, repeat, min_seconds=0.2):
+    """Seconds per call for `repeat` rounds, each looping until it has run for at least min_seconds."""
+    function()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_seconds or number >= 1 << 16:
+            break
+        number *= 4
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - start) / number)
+    return rounds
+
+
+def run(args):
+    import numpy
+    import pandas
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for key, function in cases(folder, args.quick, lambda key: not args.filter or args.filter in key):
+            # Keep the "Saved ..." and "Plotting ..." prints of the schedulers out of the report
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                rounds = time_case(function, args.repeat)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            results.append({"name": key, "min": min(rounds), "median": statistics.median(rounds), "rounds": rounds})
+            print(f"{key:60} {statistics.median(rounds) * 1000:10.3f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__,
+            "pandas": pandas.__version__,
+            "matplotlib": matplotlib.__version__,
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='UTF-8') as f:
+        json.dump(report, f, indent=4)
+    print(f'Saved benchmark results to JSON at {args.output}.')
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='UTF-8') as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+    with open(args.current, 'r', encoding='UTF-8') as f:
+        current = {result["name"]: result for result in json.load(f)["results"]}
+
+    regressions = 0
+    for name in current:
+        if name not in baseline:
+            print(f"{name:60} {'new':>10}")
+            continue
+        ratio = current[name]["median"] / baseline[name]["median"]
+        status = ""
+        if ratio > 1 + args.threshold:
+            status = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            status = "faster"
+        print(f"{name:60} {ratio:9.2f}x {status}")
+
+    print(f"{regressions} regression(s) above {args.threshold:.0%}.")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("-o", "--output", default="results/bench.json")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--quick", action="store_true", help="smaller rosters, for a fast smoke run")
+    run_parser.add_argument("-k", "--filter", default=None, help="only run benchmarks whose name contains this")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown to flag (default 0.1)")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Synthetic configs and interval lists for the benchmarks."""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_raster import DAYS_OF_WEEK
+
+PATTERN_TITLES = [
+    "Night shift (Night-Any)",
+    "Night shift (Off-Any)",
+    "Off day (Night-Off)",
+    "Off day (Off-Night)",
+    "Off day (Off-Off)",
+    "Off day (Night-Night)",
+]
+COLORS = {
+    "awake": "#55ff7f",
+    "asleep": "#0055ff",
+    "commute": "#ff5500",
+    "work": "#5500ff",
+    "empty": "#FFFFFF",
+}
+
+
+def random_intervals(rng, n_intervals=5, minute_step=10):
+    """Random interval list covering one day, wrapping past midnight like real patterns."""
+    cuts = sorted(rng.sample(range(0, 1440, minute_step), n_intervals))
+    activities = [a for a in COLORS if a != "empty"]
+    intervals = []
+    for i, start in enumerate(cuts):
+        end = cuts[(i + 1) % n_intervals]
+        intervals.append({
+            "id": rng.choice(activities),
+            "start": f"{start // 60:02}{start % 60:02}",
+            "end": f"{end // 60:02}{end % 60:02}",
+        })
+    return intervals
+
+
+def synthetic_config(rng, n_intervals=5, extra_patterns=0):
+    """Random config with all six day categories plus optional extra patterns."""
+    titles = PATTERN_TITLES + [f"Extra pattern {i}" for i in range(extra_patterns)]
+    return {
+        "workdays": [day for day in DAYS_OF_WEEK if rng.random() < 0.5],
+        "prev_week_night": rng.random() < 0.5,
+        "next_week_night": rng.random() < 0.5,
+        "schedule_patterns": [{"title": title, "intervals": random_intervals(rng, n_intervals)} for title in titles],
+        "colors": dict(COLORS),
+    }
+
+
+def synthetic_configs(n_configs, n_intervals=5, extra_patterns=0, seed=0):
+    """List of reproducible random configs."""
+    rng = random.Random(seed)
+    return [synthetic_config(rng, n_intervals, extra_patterns) for _ in range(n_configs)]
@@ -0,0 +1,72 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from schedule_raster import code_dtype, decode
+
+
+class CompactSchedule:
+    def __init__(self, codes, vocabulary, columns, index):
+        """A schedule as an int8 code grid (time slots x columns) plus its activity vocabulary."""
+        self.codes = codes
+        self.vocabulary = list(vocabulary)
+        self.columns = list(columns)
+        self.index = list(index)
+        assert self.codes.shape == (len(self.index), len(self.columns)), "Error: Code grid does not match its labels."
+
+    @classmethod
+    def from_columns(cls, columns, vocabulary, index):
+        """Encode a {column: activity list} mapping, e.g. one 48-slot list per day."""
+        codes_of = {activity: code for code, activity in enumerate(vocabulary)}
+        codes = np.array([[codes_of[activity] for activity in activities] for activities in columns.values()],
+                         dtype=code_dtype(vocabulary)).reshape(len(columns), len(index))
+        return cls(codes.T.copy(), vocabulary, columns, index)
+
+    @classmethod
+    def from_dataframe(cls, schedule):
+        """Take the codes straight out of a schedule DataFrame with categorical columns."""
+        vocabulary = list(schedule[schedule.columns[0]].cat.categories)
+        codes = np.column_stack([schedule[column].cat.codes.to_numpy() for column in schedule.columns]).astype(code_dtype(vocabulary))
+        return cls(codes, vocabulary, schedule.columns, schedule.index)
+
+    def to_dataframe(self):
+        """Categorical pandas view; every column shares the vocabulary and keeps int8 codes."""
+        import pandas as pd
+
+        return pd.DataFrame({column: pd.Categorical.from_codes(self.codes[:, i], categories=self.vocabulary)
+                             for i, column in enumerate(self.columns)}, index=self.index)
+
+    def to_csv(self, filename):
+        """Write the same CSV as the DataFrame export, decoded from the codes."""
+        with open(filename, 'w', encoding='UTF-8', newline='') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow([""] + self.columns)
+            for label, activities in zip(self.index, decode(self.codes, self.vocabulary)):
+                writer.writerow([label] + activities)
+
+    def save_npz(self, filename):
+        """Save codes and labels to a compressed NPZ file, readable without any text parsing."""
+        np.savez_compressed(filename, codes=self.codes, vocabulary=np.array(self.vocabulary),
+                            columns=np.array(self.columns), index=np.array(self.index))
+
+    @classmethod
+    def load_npz(cls, filename):
+        """Load a schedule saved with save_npz."""
+        with np.load(filename) as data:
+            return cls(data['codes'], data['vocabulary'].tolist(), data['columns'].tolist(), data['index'].tolist())
+
+    def save_raw(self, filename):
+        """Save the codes as a raw .npy file (memory-mappable) with the labels in a .json file next to it."""
+        with open(filename, 'wb') as f:
+            np.save(f, self.codes)
+        with open(f"{filename}.json", 'w', encoding='UTF-8') as f:
+            json.dump({"vocabulary": self.vocabulary, "columns": self.columns, "index": self.index}, f)
+
+    @classmethod
+    def load_raw(cls, filename, mmap_mode='r'):
+        """Load a schedule saved with save_raw, memory-mapping the codes by default."""
+        with open(f"{filename}.json", 'r', encoding='UTF-8') as f:
+            labels = json.load(f)
+        return cls(np.load(filename, mmap_mode=mmap_mode), labels["vocabulary"], labels["columns"], labels["index"])
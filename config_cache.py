@@ -0,0 +1,164 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from schedule_raster import DAY_CATEGORIES, DAYS_OF_WEEK, build_vocabulary, classify_days, decode, rasterize
+from tracing import span
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "compiled-configs")
+MEMORY_ENTRIES = 32
+DISK_ENTRIES = 256
+# Bump when CompiledConfig changes, so stale pickles are never loaded
+COMPILER_VERSION = 3
+
+HHMM = re.compile(r"^([01][0-9]|2[0-3])[0-5][0-9]$")
+
+_memory_cache = OrderedDict()
+
+
+def validate_config(config):
+    """Check a parsed config once, so everything built from it can trust its shape."""
+    assert config, "Error: config.json not found."
+    for key in ("workdays", "schedule_patterns", "colors"):
+        assert key in config, f"Error: Config is missing '{key}'."
+    assert all(day in DAYS_OF_WEEK for day in config['workdays']), "Error: Unknown day in workdays."
+
+    titles = [schedule['title'] for schedule in config['schedule_patterns']]
+    assert len(titles) == len(set(titles)), "Error: Duplicate schedule pattern title."
+    assert all(title in titles for title in DAY_CATEGORIES), "Error: Missing day category pattern."
+
+    for schedule in config['schedule_patterns']:
+        for interval in schedule['intervals']:
+            assert HHMM.match(interval['start']) and HHMM.match(interval['end']), \
+                f"Error: Bad time in '{schedule['title']}', expected HHMM."
+            assert interval['id'] in config['colors'], f"Error: No color for activity '{interval['id']}'."
+
+
+def classify_week(config):
+    """Day category of every day of the config's week."""
+    is_work = np.array([day in config['workdays'] for day in DAYS_OF_WEEK])
+    categories = classify_days(is_work, config.get('prev_week_night', False), config.get('next_week_night', False))
+    return {day: DAY_CATEGORIES[category] for day, category in zip(DAYS_OF_WEEK, categories)}
+
+
+class CompiledConfig:
+    def __init__(self, config, content_hash):
+        """Validated config with its patterns and day categories computed once.
+
+        Cached instances are shared by every caller, so the attributes hand out copies, or read-only arrays.
+        """
+        validate_config(config)
+        self._config = config
+        self.content_hash = content_hash
+
+        interval_lists = [schedule['intervals'] for schedule in config['schedule_patterns']]
+        self._vocabulary = build_vocabulary(interval_lists, config['colors'])
+        self._codes = rasterize(interval_lists, self._vocabulary)
+        self._codes.flags.writeable = False
+        self._titles = [schedule['title'] for schedule in config['schedule_patterns']]
+        self._schedule_patterns = {title: tuple(pattern) for title, pattern in zip(self._titles, decode(self._codes, self._vocabulary))}
+        self._day_categories = classify_week(config)
+
+    def __setstate__(self, state):
+        # Unpickled arrays come back writable
+        self.__dict__.update(state)
+        self._codes.flags.writeable = False
+
+    @property
+    def config(self):
+        return copy.deepcopy(self._config)
+
+    @property
+    def vocabulary(self):
+        return list(self._vocabulary)
+
+    @property
+    def pattern_codes(self):
+        """Read-only code row of every pattern, by title."""
+        return dict(zip(self._titles, self._codes))
+
+    @property
+    def schedule_patterns(self):
+        """Activity tuple of every pattern, by title."""
+        return dict(self._schedule_patterns)
+
+    @property
+    def day_categories(self):
+        return dict(self._day_categories)
+
+
+def content_hash(data):
+    """Cache key of the raw config bytes."""
+    return hashlib.sha256(f"v{COMPILER_VERSION}:".encode() + data).hexdigest()
+
+
+def compile_config(config_path):
+    """Compiled config for a file, from memory, then disk, then by compiling it."""
+    with open(config_path, 'rb') as f:
+        return compile_config_data(f.read())
+
+
+def compile_config_data(data):
+    """Compiled config for raw JSON bytes or an already parsed config dict."""
+    if isinstance(data, dict):
+        data = json.dumps(data, sort_keys=True).encode()
+    key = content_hash(data)
+
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    compiled = _load_from_disk(key)
+    if compiled is None:
+        with span("config.compile"):
+            compiled = CompiledConfig(json.loads(data), key)
+        _save_to_disk(compiled)
+
+    _memory_cache[key] = compiled
+    while len(_memory_cache) > MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+    return compiled
+
+
+def clear_cache(disk=True):
+    """Drop every cached compilation."""
+    _memory_cache.clear()
+    if disk and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+def _load_from_disk(key):
+    path = os.path.join(CACHE_DIR, f"{key}.pickle")
+    try:
+        with open(path, 'rb') as f:
+            compiled = pickle.load(f)
+        # Touch the entry so eviction goes by last use
+        os.utime(path)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return compiled
+
+
+def _save_to_disk(compiled):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{compiled.content_hash}.pickle")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+        entries = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.endswith(".pickle")]
+        entries.sort(key=os.path.getmtime)
+        for stale in entries[:-DISK_ENTRIES]:
+            os.remove(stale)
+    except OSError:
+        # The disk cache is only an optimization; a read-only tree still works from memory
+        pass
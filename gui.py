@@ -1,14 +1,16 @@
 import json
 import sys
+import threading
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QLabel,
-                             QColorDialog, QComboBox, QFileDialog, QSpacerItem, QSizePolicy)
+                             QColorDialog, QComboBox, QFileDialog, QSpacerItem, QSizePolicy, QProgressBar)
 from PyQt6.QtGui import QColor
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 
-from scheduler_sheet import SheetScheduler
-from scheduler_clock_plot import SchedulePlotter
+from tracing import enable_from_argv, span
 
+# NumPy, pandas, matplotlib and the schedulers are imported on first render, so the window paints without them
 CONFIG_FILE = "config-files/config.json"
+ALL_CLOCK_PLOTS = "All patterns"
 
 def load_config():
     try:
@@ -21,6 +23,43 @@ def save_config(data):
     with open(CONFIG_FILE, 'w', encoding='UTF-8') as f:
         json.dump(data, f, indent=4)
 
+class RenderSignals(QObject):
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class RenderTask(QRunnable):
+    """Run render steps off the UI thread. They draw into a plain matplotlib Figure, never a pyplot window."""
+
+    def __init__(self, steps, figure):
+        super().__init__()
+        self.steps = steps
+        self.figure = figure
+        self.signals = RenderSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            for i, (message, step) in enumerate(self.steps):
+                # Cancellation is checked between steps; a 300 dpi save that has started still completes
+                if self.cancel_event.is_set():
+                    self.signals.progress.emit(i, len(self.steps), "Cancelled")
+                    break
+                self.signals.progress.emit(i, len(self.steps), message)
+                with span("gui.render_step", step=message):
+                    step()
+            else:
+                self.signals.progress.emit(len(self.steps), len(self.steps), "Done")
+        except Exception as e:
+            self.signals.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        self.signals.finished.emit(self.figure)
+
+
 class WorkScheduleApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -106,7 +145,7 @@ class WorkScheduleApp(QWidget):
         self.clock_plot_dropdown = QComboBox()
         
         self.titles = [schedule['title'] for schedule in self.config['schedule_patterns']]
-        self.clock_plot_dropdown.addItems(self.titles)
+        self.clock_plot_dropdown.addItems(self.titles + [ALL_CLOCK_PLOTS])
         clock_plot_layout.addWidget(self.clock_plot_dropdown)
 
         self.clock_plot_save_image = QCheckBox("Save Results (PNG)")
@@ -145,7 +184,40 @@ class WorkScheduleApp(QWidget):
         exit_btn.clicked.connect(self.close)
         main_layout.addWidget(exit_btn)
 
-        self.setLayout(main_layout)
+        # Preview Section: embedded canvas, progress and cancel
+        preview_layout = QVBoxLayout()
+        self.preview_layout = preview_layout
+        self.canvas = QLabel("Run a clock plot or schedule sheet to preview it here.")
+        self.canvas.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.canvas.setMinimumSize(480, 480)
+        preview_layout.addWidget(self.canvas)
+
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_label = QLabel("Ready")
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_render)
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_btn)
+        preview_layout.addLayout(progress_layout)
+        preview_layout.addWidget(self.progress_label)
+
+        window_layout = QHBoxLayout()
+        window_layout.addLayout(main_layout)
+        window_layout.addLayout(preview_layout, stretch=1)
+
+        self.thread_pool = QThreadPool.globalInstance()
+        self.render_task = None
+        self.sheet_preview = None
+        self.pending_preview = None
+
+        # Live preview: a shown schedule sheet follows the workday checkboxes without a full rebuild
+        for checkbox in [self.prev_week_night, self.next_week_night, *self.day_checkboxes.values()]:
+            checkbox.toggled.connect(self.update_sheet_preview)
+        self.run_buttons = [clock_plot_btn, schedule_sheet_btn]
+
+        self.setLayout(window_layout)
         self.load_settings()
 
 
@@ -191,24 +263,107 @@ class WorkScheduleApp(QWidget):
         button.setStyleSheet(f"background-color: {color.name()};")
 
     def run_clock_plot(self):
+        from matplotlib.figure import Figure
+        from scheduler_clock_plot import SchedulePlotter
+
         option = self.clock_plot_dropdown.currentText()
         save_image = self.clock_plot_save_image.isChecked()
         print(f"Running Clock Plot: {option}, Save Image: {save_image}")
-        scheduler = SchedulePlotter(save_image)
-        scheduler.load_schedule_data(file_path=CONFIG_FILE)
-        scheduler.plot_one_schedule(option)
+        self.pending_preview = None
+        figure = Figure(figsize=(8, 8), facecolor='darkgrey')
+        with span("gui.prepare_clock_plot", option=option):
+            scheduler = SchedulePlotter(save_image, show=False, figure=figure)
+            scheduler.load_schedule_data(file_path=CONFIG_FILE)
+
+        titles = list(scheduler.schedule_data) if option == ALL_CLOCK_PLOTS else [option]
+        steps = [(f"Plotting {title}", lambda t=title: scheduler.plot_schedule(t, scheduler.schedule_data[t]))
+                 for title in titles if title in scheduler.schedule_data]
+        self.start_render(steps, figure)
 
     def run_schedule_sheet(self):
+        from matplotlib.figure import Figure
+        from scheduler_sheet import SheetScheduler
+
         save_image = self.schedule_sheet_save_image.isChecked()
         print(f"Running Schedule Sheet, Save Image: {save_image}")
-        scheduler = SheetScheduler(CONFIG_FILE)
-        scheduler.plot_schedule()
+        with span("gui.prepare_schedule_sheet"):
+            scheduler = SheetScheduler(CONFIG_FILE)
+        self.pending_preview = scheduler
+        figure = Figure(figsize=(12, 8), facecolor='darkgrey')
+
         if save_image:
-            scheduler.save_to_csv()
-            scheduler.save_to_png()
-        
+            steps = [("Saving CSV", scheduler.save_to_csv),
+                     ("Saving PNG", lambda: scheduler.save_to_png(fig=figure))]
+        else:
+            steps = [("Drawing schedule sheet", lambda: scheduler.plot_schedule(fast=True, fig=figure))]
+        self.start_render(steps, figure)
+
+    def start_render(self, steps, figure):
+        if self.render_task is not None:
+            return
+        self.render_task = RenderTask(steps, figure)
+        self.render_task.signals.progress.connect(self.show_progress)
+        self.render_task.signals.finished.connect(self.show_figure)
+        self.render_task.signals.failed.connect(self.show_failure)
+        self.set_rendering(True)
+        self.thread_pool.start(self.render_task)
+
+    def cancel_render(self):
+        if self.render_task is not None:
+            self.render_task.cancel()
+            self.cancel_btn.setEnabled(False)
+
+    def set_rendering(self, rendering):
+        for btn in self.run_buttons:
+            btn.setEnabled(not rendering)
+        self.cancel_btn.setEnabled(rendering)
+
+    def show_progress(self, done, total, message):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.progress_label.setText(message)
+
+    def show_figure(self, figure):
+        self.render_task = None
+        self.set_rendering(False)
+        if figure is not None:
+            self.replace_canvas(figure)
+            self.sheet_preview = self.pending_preview
+            self.update_sheet_preview()
+
+    def update_sheet_preview(self):
+        # Only touch the figure from the UI thread while no worker is drawing into it
+        if self.sheet_preview is None or self.render_task is not None:
+            return
+        workdays = [day for day, checkbox in self.day_checkboxes.items() if checkbox.isChecked()]
+        changed = self.sheet_preview.update_workdays(workdays, self.prev_week_night.isChecked(), self.next_week_night.isChecked())
+        if changed:
+            self.progress_label.setText(f"Preview updated: {', '.join(changed)}")
+
+    def show_failure(self, message):
+        self.render_task = None
+        self.set_rendering(False)
+        self.progress_label.setText(f"Failed: {message}")
+
+    def replace_canvas(self, figure):
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+
+        # A figure can only be drawn by one canvas, so each result gets a new canvas in place of the old one
+        with span("gui.replace_canvas"):
+            canvas = FigureCanvasQTAgg(figure)
+            canvas.setMinimumSize(480, 480)
+            self.preview_layout.replaceWidget(self.canvas, canvas)
+            self.canvas.deleteLater()
+            self.canvas = canvas
+            canvas.draw_idle()
+
+    def closeEvent(self, event):
+        self.cancel_render()
+        super().closeEvent(event)
+
 
 if __name__ == '__main__':
+    enable_from_argv(sys.argv)
     app = QApplication(sys.argv)
     window = WorkScheduleApp()
     window.setWindowTitle("Night Shift Schedule Helper")
@@ -0,0 +1,154 @@
+"""Export schedules as iCalendar (.ics) files, one event per activity run, streamed out one week at a time."""
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+from batch_render import find_configs, output_names
+from schedule_horizon import HorizonScheduler
+from schedule_raster import EMPTY, MINUTES_PER_DAY, find_runs
+
+PRODID = "-//Night Shift Schedule Helper//EN"
+
+
+class RunCoalescer:
+    def __init__(self):
+        """Turn a stream of HorizonWeeks into (start, end, activity) events, merging runs across midnight and across weeks.
+
+        Only the last, still open run is kept between weeks, so memory does not grow with the horizon.
+        """
+        self.open_run = None
+
+    def push(self, week):
+        """Yield the events that are complete after this week."""
+        slot_minutes = MINUTES_PER_DAY // week.codes.shape[1]
+        first = datetime.datetime.combine(week.dates[0], datetime.time())
+        _, starts, ends, codes = find_runs(np.asarray(week.codes).reshape(1, -1))
+
+        for start, end, code in zip(starts.tolist(), ends.tolist(), codes.tolist()):
+            activity = week.vocabulary[code]
+            run_start = first + datetime.timedelta(minutes=start * slot_minutes)
+            run_end = first + datetime.timedelta(minutes=end * slot_minutes)
+            if self.open_run is not None and self.open_run[2] == activity and self.open_run[1] == run_start:
+                self.open_run = (self.open_run[0], run_end, activity)
+                continue
+            if self.open_run is not None:
+                yield self.open_run
+            self.open_run = (run_start, run_end, activity)
+
+    def flush(self):
+        """Yield the run still open at the end of the schedule."""
+        if self.open_run is not None:
+            yield self.open_run
+        self.open_run = None
+
+
+def iter_events(weeks):
+    """Generator of coalesced (start, end, activity) events over an iterable of HorizonWeeks."""
+    coalescer = RunCoalescer()
+    for week in weeks:
+        yield from coalescer.push(week)
+    yield from coalescer.flush()
+
+
+def escape_text(text):
+    """Escape a TEXT value (RFC 5545, 3.3.11)."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold_line(line):
+    """Fold a content line into chunks of at most 75 octets, continuation lines starting with a space."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    chunks, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not chunks else 74), len(data))
+        # Never split a UTF-8 sequence
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(data[start:end].decode())
+        start = end
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def css_color_name(color):
+    """Nearest CSS color name, since the iCalendar COLOR property (RFC 7986) only takes names."""
+    from matplotlib.colors import CSS4_COLORS, to_rgb
+
+    rgb = np.array(to_rgb(color))
+    names = list(CSS4_COLORS)
+    distances = [np.sum((np.array(to_rgb(CSS4_COLORS[name])) - rgb) ** 2) for name in names]
+    return names[int(np.argmin(distances))]
+
+
+class IcsSink:
+    def __init__(self, filename, colors, calendar_name=None, skip=(EMPTY,)):
+        """Stream VEVENTs to an .ics file as weeks arrive. Event categories and colors come from config['colors']."""
+        self.filename = filename
+        self.skip = set(skip)
+        self.coalescer = RunCoalescer()
+        self.color_names = {activity: css_color_name(color) for activity, color in colors.items()}
+        self.colors = colors
+        self.uid_prefix = os.path.splitext(os.path.basename(filename))[0]
+        self.stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.events = 0
+
+        self.file = open(filename, 'w', encoding='UTF-8', newline='')
+        self.write_lines(["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+                          f"X-WR-CALNAME:{escape_text(calendar_name or self.uid_prefix)}"])
+
+    def write_lines(self, lines):
+        self.file.write("".join(fold_line(line) for line in lines))
+
+    def write_event(self, start, end, activity):
+        if activity in self.skip:
+            return
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{start:%Y%m%dT%H%M%S}-{escape_text(activity)}-{self.uid_prefix}@night-shift-schedule-helper",
+            f"DTSTAMP:{self.stamp}",
+            f"DTSTART:{start:%Y%m%dT%H%M%S}",
+            f"DTEND:{end:%Y%m%dT%H%M%S}",
+            f"SUMMARY:{escape_text(activity.capitalize())}",
+            f"CATEGORIES:{escape_text(activity)}",
+        ]
+        if activity in self.colors:
+            lines += [f"COLOR:{self.color_names[activity]}", f"X-SCHEDULE-COLOR:{self.colors[activity]}"]
+        lines.append("END:VEVENT")
+        self.write_lines(lines)
+        self.events += 1
+
+    def write_week(self, week):
+        for event in self.coalescer.push(week):
+            self.write_event(*event)
+
+    def close(self):
+        for event in self.coalescer.flush():
+            self.write_event(*event)
+        self.write_lines(["END:VCALENDAR"])
+        self.file.close()
+        print(f'Saved {self.events} events to iCalendar at {self.filename}.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="+", help="config directories, config files or manifests")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--weeks", type=int, default=52, help="number of weeks to export")
+    parser.add_argument("-o", "--output-dir", default="results/calendars", help="folder for the .ics files, one per config")
+    args = parser.parse_args(argv)
+
+    config_paths = find_configs(args.sources)
+    assert config_paths, "Error: No config files found."
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # The config's workdays repeat every week; use schedule_horizon.py -o name.ics for rotations or workdate files
+    for path, name in zip(config_paths, output_names(config_paths)):
+        scheduler = HorizonScheduler(path, args.start, args.weeks, slot_minutes=1)
+        scheduler.stream(IcsSink(os.path.join(args.output_dir, f"{name}.ics"), scheduler.config['colors'], calendar_name=name))
+
+
+if __name__ == "__main__":
+    main()
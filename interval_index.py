@@ -0,0 +1,173 @@
+"""Query schedules by time: what is happening at a moment, what overlaps a range, when an activity comes next,
+and which windows a whole team has free. Times are minutes from the start of the schedule (day 0, 00:00)."""
+import argparse
+import bisect
+import datetime
+import heapq
+
+import numpy as np
+
+from batch_render import find_configs
+from config_cache import compile_config
+from run_schedule import RunSchedule
+from schedule_raster import DAY_CATEGORIES, DAYS_OF_WEEK, MINUTES_PER_DAY, build_vocabulary, find_runs, time_to_minutes
+
+
+class IntervalIndex:
+    def __init__(self, starts, ends, activities, start_date=None):
+        """Sorted, back-to-back activity runs covering the whole schedule, searched with bisect.
+
+        Every query is a binary search over the run boundaries, so it takes logarithmic time however many weeks are indexed.
+        """
+        self.starts = list(starts)
+        self.ends = list(ends)
+        self.activities = list(activities)
+        self.start_date = start_date
+        assert self.starts and self.starts[0] == 0, "Error: Runs must start at minute 0."
+        assert self.starts[1:] == self.ends[:-1], "Error: Runs must be sorted and back to back."
+
+        # Run boundaries per activity, for "next time X happens" lookups
+        self.runs_of = {}
+        for start, end, activity in zip(self.starts, self.ends, self.activities):
+            starts, ends = self.runs_of.setdefault(activity, ([], []))
+            starts.append(start)
+            ends.append(end)
+
+    @property
+    def end(self):
+        return self.ends[-1]
+
+    @classmethod
+    def from_codes(cls, codes, vocabulary, slot_minutes=1, start_date=None):
+        """Index a (days, slots) code array, coalescing runs that continue past midnight into the next day."""
+        _, starts, ends, run_codes = find_runs(np.asarray(codes).reshape(1, -1))
+        return cls((starts * slot_minutes).tolist(), (ends * slot_minutes).tolist(), [vocabulary[code] for code in run_codes], start_date)
+
+    @classmethod
+    def from_patterns(cls, config, day_categories, start_date=None):
+        """Index consecutive days, each following the config pattern named by its day category, to the minute."""
+        patterns = {schedule['title']: schedule['intervals'] for schedule in config['schedule_patterns']}
+        vocabulary = build_vocabulary([patterns[title] for title in DAY_CATEGORIES], config['colors'])
+        # Exact runs of each distinct pattern, laid end to end day by day; a run continuing past midnight is merged
+        pattern_runs = RunSchedule.from_intervals([patterns[title] for title in DAY_CATEGORIES], DAY_CATEGORIES, vocabulary)
+        starts, ends, activities = [], [], []
+        for day, category in enumerate(day_categories):
+            offset = day * MINUTES_PER_DAY
+            for _, start, end, activity in pattern_runs.runs([DAY_CATEGORIES.index(category)]):
+                if activities and activities[-1] == activity and ends[-1] == start + offset:
+                    ends[-1] = end + offset
+                else:
+                    starts.append(start + offset)
+                    ends.append(end + offset)
+                    activities.append(activity)
+        return cls(starts, ends, activities, start_date)
+
+    @classmethod
+    def from_config(cls, config_path):
+        """Index the week of a config, Sunday to Saturday."""
+        compiled = compile_config(config_path)
+        return cls.from_patterns(compiled.config, [compiled.day_categories[day] for day in DAYS_OF_WEEK])
+
+    @classmethod
+    def from_horizon(cls, horizon):
+        """Index every week of a HorizonScheduler."""
+        categories = [category for week in horizon.iter_weeks() for category in week.categories]
+        return cls.from_patterns(horizon.config, categories, horizon.start)
+
+    def minutes(self, day, time=None):
+        """Minutes from the start for a day number and an HHMM time, or for a datetime on a dated horizon."""
+        if isinstance(day, datetime.datetime):
+            assert self.start_date is not None, "Error: Schedule has no start date."
+            return int((day - datetime.datetime.combine(self.start_date, datetime.time())).total_seconds() // 60)
+        return day * MINUTES_PER_DAY + time_to_minutes(time)
+
+    def label(self, minute):
+        """Readable day and time of a minute, e.g. 'Monday 07:30' or '2026-01-05 07:30'."""
+        day, minute = divmod(minute, MINUTES_PER_DAY)
+        if self.start_date is not None:
+            day_label = (self.start_date + datetime.timedelta(days=day)).isoformat()
+        else:
+            day_label = DAYS_OF_WEEK[day % 7] + (f" (week {day // 7 + 1})" if self.end > 7 * MINUTES_PER_DAY else "")
+        return f"{day_label} {minute // 60:02}:{minute % 60:02}"
+
+    def run_at(self, minute):
+        """Position of the run that covers a minute."""
+        assert 0 <= minute < self.end, "Error: Time outside the schedule."
+        return bisect.bisect_right(self.starts, minute) - 1
+
+    def at(self, minute):
+        """Activity going on at a minute."""
+        return self.activities[self.run_at(minute)]
+
+    def overlapping(self, start, end):
+        """(start, end, activity) of every run overlapping [start, end), clipped to the range and to the schedule."""
+        start, end = max(start, 0), min(end, self.end)
+        if end <= start:
+            return []
+        first = self.run_at(start)
+        last = bisect.bisect_left(self.starts, end)
+        return [(max(self.starts[i], start), min(self.ends[i], end), self.activities[i]) for i in range(first, last)]
+
+    def next_activity(self, activity, minute):
+        """(start, end) of the first run of an activity still going on at or after a minute, or None."""
+        if activity not in self.runs_of:
+            return None
+        starts, ends = self.runs_of[activity]
+        i = bisect.bisect_right(ends, minute)
+        if i == len(ends):
+            return None
+        return max(starts[i], minute), ends[i]
+
+    def free_windows(self, free_activities, start=0, end=None):
+        """Merged (start, end) windows within [start, end) spent on any of free_activities."""
+        windows = []
+        for run_start, run_end, activity in self.overlapping(start, self.end if end is None else end):
+            if activity not in free_activities:
+                continue
+            if windows and windows[-1][1] == run_start:
+                windows[-1] = (windows[-1][0], run_end)
+            else:
+                windows.append((run_start, run_end))
+        return windows
+
+
+def common_free_windows(indexes, free_activities=("awake",), start=0, end=None, min_minutes=0):
+    """Windows in which everyone is free, by sweeping over the merged, already sorted window edges of all people."""
+    if not indexes:
+        return []
+    end = min(index.end for index in indexes) if end is None else end
+    edges = [[edge for window_start, window_end in index.free_windows(free_activities, start, end)
+              for edge in ((window_start, 1), (window_end, -1))] for index in indexes]
+
+    windows, free_count, window_start = [], 0, None
+    # Each person's edges are sorted, so a k-way merge sorts them all; at equal times, ends (-1) come before starts
+    for minute, step in heapq.merge(*edges):
+        free_count += step
+        if free_count == len(indexes):
+            window_start = minute
+        elif window_start is not None:
+            if minute - window_start >= max(min_minutes, 1):
+                windows.append((window_start, minute))
+            window_start = None
+    return windows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="+", help="config directories, config files or manifests")
+    parser.add_argument("--free", nargs="+", default=["awake"], help="activities that leave someone free (default: awake)")
+    parser.add_argument("--min-minutes", type=int, default=30, help="shortest window to list")
+    args = parser.parse_args(argv)
+
+    config_paths = find_configs(args.sources)
+    assert config_paths, "Error: No config files found."
+
+    indexes = [IntervalIndex.from_config(path) for path in config_paths]
+    windows = common_free_windows(indexes, args.free, min_minutes=args.min_minutes)
+    print(f'Found {len(windows)} common free windows for {len(indexes)} people.')
+    for start, end in windows:
+        print(f'{indexes[0].label(start)} - {indexes[0].label(end)} ({(end - start) // 60}h{(end - start) % 60:02}m)')
+
+
+if __name__ == "__main__":
+    main()
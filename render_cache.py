@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "renders")
+# Size limit of the cached images; SCHEDULE_RENDER_CACHE_MB=0 turns the cache off
+MAX_BYTES = int(float(os.environ.get("SCHEDULE_RENDER_CACHE_MB", 512)) * 1024 * 1024)
+# Bump when the drawing code changes, so images drawn by older code are never reused
+RENDERER_VERSION = 2
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def image_format(filename):
+    """Format savefig writes to a filename: its extension, or matplotlib's default format without one."""
+    import matplotlib
+
+    return os.path.splitext(filename)[1][1:].lower() or matplotlib.rcParams["savefig.format"]
+
+
+def render_key(kind, fmt, **inputs):
+    """Cache key of everything that affects an image: the file format, the drawn data, colors, title, dpi, figure size,
+    bounding box and matplotlib version."""
+    import matplotlib
+
+    data = json.dumps({"kind": kind, "format": fmt, "inputs": inputs, "matplotlib": matplotlib.__version__,
+                       "renderer": RENDERER_VERSION}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def entry_path(key, filename):
+    """Cache entry of a key, named by the format of the file it is linked to."""
+    return os.path.join(CACHE_DIR, f"{key}.{image_format(filename)}")
+
+
+def fetch(key, filename):
+    """Put the cached image for key at filename, hard-linked or else copied. Returns False on a miss."""
+    if MAX_BYTES <= 0:
+        return False
+    path = entry_path(key, filename)
+    try:
+        # Touch the entry so eviction goes by last use
+        os.utime(path)
+        # Never write through an old link into a cache entry
+        if os.path.lexists(filename):
+            os.remove(filename)
+        try:
+            os.link(path, filename)
+        except OSError:
+            shutil.copyfile(path, filename)
+    except OSError:
+        _stats["misses"] += 1
+        return False
+    _stats["hits"] += 1
+    return True
+
+
+def store(key, filename):
+    """Copy a freshly rendered image into the cache, then evict the least recently used images over the size limit."""
+    if MAX_BYTES <= 0:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = entry_path(key, filename)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(filename, temp_path)
+        os.replace(temp_path, path)
+        evict(MAX_BYTES)
+    except OSError:
+        # The render cache is only an optimization; a read-only tree still renders
+        pass
+
+
+def evict(max_bytes):
+    """Remove the least recently used images until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".tmp"):
+            try:
+                status = os.stat(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+            _stats["evictions"] += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def prepare(filename):
+    """Unlink the image at filename before rendering to it, in case it is a hard link into the cache."""
+    if os.path.lexists(filename):
+        os.remove(filename)
+
+
+def stats():
+    """Hits, misses and evictions of this process, with the hit rate."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return dict(_stats, hit_rate=_stats["hits"] / lookups if lookups else 0.0)
+
+
+def take_stats():
+    """Return and reset the counts, e.g. to send them from a worker process to the parent."""
+    counts = dict(_stats)
+    for name in _stats:
+        _stats[name] = 0
+    return counts
+
+
+def add_stats(counts):
+    """Merge counts from another process."""
+    for name, count in counts.items():
+        _stats[name] += count
+
+
+def clear_cache():
+    """Drop every cached image."""
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
@@ -0,0 +1,201 @@
+"""Local HTTP service rendering schedules from a posted config: sheet PNG, CSV or JSON grid, and clock plot PNGs.
+
+    POST /sheet.png, /sheet.csv, /sheet.json       body: config JSON
+    POST /clock.png?title=Night%20shift%20(Night-Any)
+    GET  /health, /stats
+
+It only listens on 127.0.0.1. Rendering runs in a process pool; identical requests in flight share one render, and
+once queue_limit distinct renders are pending, new ones get 503 with Retry-After until the queue drains.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from batch_render import available_cores, init_worker
+
+HOST = "127.0.0.1"
+ROUTES = {"/sheet.png": ("sheet", "png"), "/sheet.csv": ("sheet", "csv"), "/sheet.json": ("sheet", "json"), "/clock.png": ("clock", "png")}
+CONTENT_TYPES = {"png": "image/png", "csv": "text/csv; charset=utf-8", "json": "application/json"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def render_request(kind, fmt, config_data, title=None):
+    """Render one request in a worker process and return the response body."""
+    from config_cache import compile_config_data
+    from scheduler_clock_plot import SchedulePlotter
+    from scheduler_sheet import SheetScheduler
+
+    # Reject a broken config before anything is drawn
+    try:
+        compile_config_data(config_data)
+    except (AssertionError, KeyError, TypeError, ValueError) as e:
+        raise BadRequest(f"Invalid config: {e}") from None
+
+    with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+        config_path = os.path.join(folder, "config.json")
+        with open(config_path, 'wb') as f:
+            f.write(config_data)
+        output = os.path.join(folder, f"output.{fmt}")
+
+        if kind == "clock":
+            plotter = SchedulePlotter(True, output_dir=folder, show=False)
+            plotter.load_schedule_data(config_path)
+            if title not in plotter.schedule_data:
+                raise BadRequest(f"No schedule pattern titled {title!r}.")
+            plotter.plot_schedule(title, plotter.schedule_data[title])
+            plotter.close()
+            output = os.path.join(folder, f"{plotter.snake_case(title)}.png")
+        elif fmt == "png":
+            SheetScheduler(config_path).save_to_png(output)
+        elif fmt == "csv":
+            SheetScheduler(config_path).save_to_csv(output)
+        else:
+            scheduler = SheetScheduler(config_path)
+            compact = scheduler.to_compact()
+            return json.dumps({"columns": compact.columns, "index": compact.index, "vocabulary": compact.vocabulary,
+                               "codes": compact.codes.T.tolist(), "day_categories": scheduler.day_categories}).encode()
+
+        with open(output, 'rb') as f:
+            return f.read()
+
+
+class RenderService:
+    def __init__(self, jobs=None, queue_limit=64, max_body=1 << 20):
+        """HTTP front end on the event loop, renders in a process pool."""
+        # Children inherit this before they import matplotlib, so no process can pick an interactive backend
+        os.environ["MPLBACKEND"] = "Agg"
+        self.jobs = jobs or available_cores()
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker)
+        self.queue_limit = queue_limit
+        self.max_body = max_body
+        self.in_flight = {}
+        self.stats = {"requests": 0, "rendered": 0, "coalesced": 0, "rejected": 0, "failed": 0}
+
+    async def render(self, kind, fmt, body, title=None):
+        """Response body for a render, sharing the result of an identical render already in flight."""
+        key = hashlib.sha256(f"{kind}:{fmt}:{title}:".encode() + body).hexdigest()
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+        else:
+            if len(self.in_flight) >= self.queue_limit:
+                self.stats["rejected"] += 1
+                return None
+            future = asyncio.get_running_loop().run_in_executor(self.pool, render_request, kind, fmt, body, title)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.stats["rendered"] += 1
+        # A client that hangs up must not cancel the render for the others waiting on it
+        return await asyncio.shield(future)
+
+    async def dispatch(self, method, target, body):
+        """(status, content type, body, extra headers) for one request."""
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/health":
+            return 200, CONTENT_TYPES["json"], b'{"status": "ok"}', {}
+        if method == "GET" and url.path == "/stats":
+            stats = dict(self.stats, in_flight=len(self.in_flight), queue_limit=self.queue_limit)
+            return 200, CONTENT_TYPES["json"], json.dumps(stats).encode(), {}
+        if url.path not in ROUTES:
+            return 404, "text/plain", b"Not found.", {}
+        if method != "POST":
+            return 405, "text/plain", b"Use POST with the config JSON as body.", {"Allow": "POST"}
+
+        kind, fmt = ROUTES[url.path]
+        title = parse_qs(url.query).get("title", [None])[0]
+        if kind == "clock" and title is None:
+            return 400, "text/plain", b"Missing ?title= of the schedule pattern.", {}
+
+        try:
+            payload = await self.render(kind, fmt, body, title)
+        except BadRequest as e:
+            return 400, "text/plain", str(e).encode(), {}
+        except Exception as e:
+            self.stats["failed"] += 1
+            return 500, "text/plain", f"{type(e).__name__}: {e}".encode(), {}
+        if payload is None:
+            return 503, "text/plain", b"Render queue is full, retry shortly.", {"Retry-After": "1"}
+        return 200, CONTENT_TYPES[fmt], payload, {}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests unless asked not to."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').rstrip("\r\n").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                    headers = {name.strip().lower(): value.strip() for name, value in (line.split(":", 1) for line in header_lines)}
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self.respond(writer, 400, "text/plain", b"Malformed request.", {}, keep_alive=False)
+                    break
+                if length > self.max_body:
+                    await self.respond(writer, 413, "text/plain", b"Config too large.", {}, keep_alive=False)
+                    break
+
+                body = await reader.readexactly(length)
+                self.stats["requests"] += 1
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, *await self.dispatch(method, target, body), keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, content_type, body, headers, keep_alive=True):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, port):
+        server = await asyncio.start_server(self.handle, HOST, port)
+        print(f'Serving schedules at http://{HOST}:{port}/ with {self.jobs} workers.', flush=True)
+
+        # Stop cleanly on SIGTERM too, so the worker processes are shut down with the server
+        stop = asyncio.Event()
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--port", type=int, default=8765)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: available cores)")
+    parser.add_argument("--queue-limit", type=int, default=64, help="distinct renders pending before answering 503")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(RenderService(args.jobs, args.queue_limit).serve(args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Pick the workdays of a roster that disturb sleep the least, given the shifts required and the days that must stay off.
+
+The cost of a roster is how far the sleep midpoint moves from one day's pattern to the next, summed over the horizon.
+"""
+import argparse
+import datetime
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_render import available_cores
+from config_cache import compile_config
+from schedule_raster import DAY_CATEGORIES, classify_days
+
+Roster = namedtuple("Roster", ["workdates", "categories", "cost"])
+
+# CATEGORY[prev_work][work][next_work] is the DAY_CATEGORIES index of a day
+CATEGORY = [[[int(classify_days([work], prev_work, next_work)[0]) for next_work in (False, True)]
+             for work in (False, True)] for prev_work in (False, True)]
+
+
+def sleep_midpoint(codes, asleep_code, slot_hours=0.5):
+    """Circular mean time of the asleep slots of a pattern, in hours, or None without sleep."""
+    angles = (np.flatnonzero(codes == asleep_code) + 0.5) * slot_hours / 24 * 2 * np.pi
+    if not len(angles) or np.hypot(np.cos(angles).sum(), np.sin(angles).sum()) < 1e-9:
+        return None
+    return np.arctan2(np.sin(angles).sum(), np.cos(angles).sum()) % (2 * np.pi) * 24 / (2 * np.pi)
+
+
+def transition_costs(compiled, sleep_activity="asleep"):
+    """6x6 matrix of hours the sleep midpoint moves from a day of one category to a day of the next."""
+    assert sleep_activity in compiled.vocabulary, f"Error: No '{sleep_activity}' activity in the config."
+    asleep_code = compiled.vocabulary.index(sleep_activity)
+    midpoints = [sleep_midpoint(compiled.pattern_codes[title], asleep_code) for title in DAY_CATEGORIES]
+
+    costs = np.zeros((len(DAY_CATEGORIES), len(DAY_CATEGORIES)))
+    for i, first in enumerate(midpoints):
+        for j, second in enumerate(midpoints):
+            if first is not None and second is not None:
+                costs[i, j] = min(abs(first - second), 24 - abs(first - second))
+    return costs
+
+
+def periods(start, days, shifts_per_week=None, shifts_per_month=None):
+    """Period number of every day and the (required, full) shift count of every period.
+
+    Weeks run in blocks of 7 days from start, months follow the calendar. A period cut off by either end of
+    the horizon may have fewer shifts than required, never more.
+    """
+    if shifts_per_week is not None:
+        assert shifts_per_month is None, "Error: Give shifts per week or per month, not both."
+        period_of = [day // 7 for day in range(days)]
+        limits = [(shifts_per_week, period_of.count(period) == 7) for period in range(max(period_of) + 1)]
+        return period_of, limits
+
+    if shifts_per_month is not None:
+        dates = [start + datetime.timedelta(days=day) for day in range(days)]
+        months = list(dict.fromkeys((date.year, date.month) for date in dates))
+        period_of = [months.index((date.year, date.month)) for date in dates]
+        limits = [(shifts_per_month, dates[0].day == 1 if period == 0 else
+                   period < len(months) - 1 or (dates[-1] + datetime.timedelta(days=1)).day == 1)
+                  for period in range(len(months))]
+        return period_of, limits
+
+    raise AssertionError("Error: Give the shifts per week or per month.")
+
+
+def optimize_roster(compiled, start, days, shifts_per_week=None, shifts_per_month=None, must_off=(), sleep_activity="asleep"):
+    """Cheapest roster by dynamic programming over the work/off choices of three consecutive days.
+
+    A day's category depends on the day before and after it, so a transition cost between two days depends on four
+    work/off choices in a row. Keeping the last three choices (plus the shift count of the current period) as the
+    state makes every day a step over at most 8 x (shifts + 1) states instead of 2^days rosters.
+    must_off holds dates or weekday names. Returns None when the constraints cannot be met.
+    """
+    costs = transition_costs(compiled, sleep_activity).tolist()
+    prev_night = int(compiled.config.get('prev_week_night', False))
+    next_night = int(compiled.config.get('next_week_night', False))
+    period_of, limits = periods(start, days, shifts_per_week, shifts_per_month)
+    dates = [start + datetime.timedelta(days=day) for day in range(days)]
+    off = [date in must_off or date.strftime("%A") in must_off for date in dates]
+
+    # state: (choice two days back, choice one day back, today's choice, shifts in today's period) -> cost
+    layer = {}
+    for work in (0, 1):
+        if not (work and off[0]):
+            layer[(0, prev_night, work, work)] = 0.0
+    parents = []
+
+    for day in range(1, days + 1):
+        new_period = day < days and period_of[day] != period_of[day - 1]
+        choices = (next_night,) if day == days else (0,) if off[day] else (0, 1)
+        next_layer, parent = {}, {}
+        for (two_back, one_back, today, count), cost in layer.items():
+            # Close a period: full ones need exactly their shifts, cut-off ones at most
+            if new_period or day == days:
+                required, full = limits[period_of[day - 1]]
+                if count > required or (full and count < required):
+                    continue
+            for choice in choices:
+                new_count = 0 if new_period else count
+                if day < days:
+                    new_count += choice
+                    if new_count > limits[period_of[day]][0]:
+                        continue
+                step = costs[CATEGORY[two_back][one_back][today]][CATEGORY[one_back][today][choice]] if day > 1 else 0.0
+                state = (one_back, today, choice, new_count)
+                if cost + step < next_layer.get(state, float("inf")):
+                    next_layer[state] = cost + step
+                    parent[state] = (two_back, one_back, today, count)
+        parents.append(parent)
+        layer = next_layer
+
+    if not layer:
+        return None
+
+    # Walk the parent pointers back from the cheapest final state
+    state = min(layer, key=layer.get)
+    cost = layer[state]
+    choices = []
+    for parent in reversed(parents):
+        state = parent[state]
+        choices.append(state[2])
+    choices.reverse()
+
+    is_work = np.array(choices, dtype=bool)
+    categories = [DAY_CATEGORIES[category] for category in classify_days(is_work, bool(prev_night), bool(next_night))]
+    return Roster([date for date, work in zip(dates, choices) if work], categories, cost)
+
+
+def roster_cost(compiled, is_work, sleep_activity="asleep"):
+    """Cost of a given work/off sequence, e.g. the config's own workdays repeated every week."""
+    costs = transition_costs(compiled, sleep_activity)
+    categories = classify_days(is_work, compiled.config.get('prev_week_night', False), compiled.config.get('next_week_night', False))
+    return float(costs[categories[:-1], categories[1:]].sum())
+
+
+def run_scenario(scenario):
+    """Optimize one scenario dict: config, start, weeks and any of shifts_per_week, shifts_per_month, must_off."""
+    compiled = compile_config(scenario["config"])
+    start = datetime.date.fromisoformat(str(scenario["start"]))
+    must_off = {datetime.date.fromisoformat(day) if day[:1].isdigit() else day for day in scenario.get("must_off", [])}
+    return optimize_roster(compiled, start, scenario["weeks"] * 7, scenario.get("shifts_per_week"),
+                           scenario.get("shifts_per_month"), must_off, scenario.get("sleep_activity", "asleep"))
+
+
+def run_scenarios(scenarios, jobs=None):
+    """Optimize independent scenarios in parallel. Returns one Roster (or None) per scenario, in order."""
+    if len(scenarios) == 1:
+        return [run_scenario(scenarios[0])]
+    with ProcessPoolExecutor(max_workers=min(jobs or available_cores(), len(scenarios))) as pool:
+        return list(pool.map(run_scenario, scenarios))
+
+
+def save_workdates(roster, filename):
+    """Save the workdates one per line, the format schedule_horizon.py --workdates reads."""
+    with open(filename, 'w', encoding='UTF-8') as f:
+        f.writelines(f"{date.isoformat()}\n" for date in roster.workdates)
+    print(f'Saved roster workdates at {filename}.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("config", nargs="?", help="config JSON with the six day category patterns")
+    parser.add_argument("--start", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--weeks", type=int, default=4, help="number of weeks to plan")
+    shifts = parser.add_mutually_exclusive_group()
+    shifts.add_argument("--shifts-per-week", type=int, default=None)
+    shifts.add_argument("--shifts-per-month", type=int, default=None)
+    parser.add_argument("--must-off", nargs="+", default=[], help="dates (YYYY-MM-DD) or weekday names to keep off")
+    parser.add_argument("--scenarios", help="JSON list of scenarios with the same keys, optimized in parallel instead")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for --scenarios")
+    parser.add_argument("-o", "--output-dir", default="results/rosters", help="folder for the workdate files")
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        with open(args.scenarios, 'r', encoding='UTF-8') as f:
+            scenarios = json.load(f)
+    else:
+        assert args.config and args.start, "Error: Give a config and --start, or --scenarios."
+        scenarios = [{"config": args.config, "start": args.start, "weeks": args.weeks, "shifts_per_week": args.shifts_per_week,
+                      "shifts_per_month": args.shifts_per_month, "must_off": args.must_off}]
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for i, (scenario, roster) in enumerate(zip(scenarios, run_scenarios(scenarios, args.jobs)), start=1):
+        name = scenario.get("name", f"scenario-{i}")
+        if roster is None:
+            print(f'{name}: no roster meets the constraints.')
+            continue
+        print(f'{name}: {len(roster.workdates)} shifts, sleep midpoint moves {roster.cost:.1f}h in total.')
+        save_workdates(roster, os.path.join(args.output_dir, f"{name}.txt"))
+
+
+if __name__ == "__main__":
+    main()
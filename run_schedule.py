@@ -0,0 +1,106 @@
+import numpy as np
+
+from compact_schedule import CompactSchedule
+from schedule_raster import MINUTES_PER_DAY, code_dtype, slots_per_day, time_to_minutes
+
+
+def interval_runs(intervals, codes_of):
+    """Exact (bounds, codes) runs of one day's intervals: run i covers minutes bounds[i] to bounds[i + 1].
+
+    Same rules as rasterize, to the minute: later intervals overwrite earlier ones, an interval that does not end
+    after it starts wraps past midnight, and uncovered time is "empty" (code 0).
+    """
+    pieces = []
+    for order, interval in enumerate(intervals):
+        start, end = time_to_minutes(interval["start"]), time_to_minutes(interval["end"])
+        code = codes_of[interval["id"]]
+        if end > start:
+            pieces.append((start, end, order, code))
+        else:
+            pieces.append((start, MINUTES_PER_DAY, order, code))
+            pieces.append((0, end, order, code))
+
+    edges = sorted({0, MINUTES_PER_DAY}.union(*((start, end) for start, end, _, _ in pieces)))
+    bounds, codes = [0], []
+    for start, end in zip(edges[:-1], edges[1:]):
+        covering = [(order, code) for piece_start, piece_end, order, code in pieces if piece_start <= start and end <= piece_end]
+        code = max(covering)[1] if covering else 0
+        # Merge with the previous run when the activity does not change
+        if codes and codes[-1] == code:
+            bounds[-1] = end
+        else:
+            codes.append(code)
+            bounds.append(end)
+    return bounds, codes
+
+
+class RunSchedule:
+    def __init__(self, bounds, codes, vocabulary, columns):
+        """A schedule as run boundaries (in minutes) and run codes per column, exact to the minute.
+
+        Memory grows with the number of activity changes, not with the time resolution.
+        """
+        self.bounds = [np.asarray(column_bounds, dtype=np.int16) for column_bounds in bounds]
+        self.codes = [np.asarray(column_codes, dtype=code_dtype(vocabulary)) for column_codes in codes]
+        self.vocabulary = list(vocabulary)
+        self.columns = list(columns)
+        assert len(self.bounds) == len(self.codes) == len(self.columns), "Error: Runs do not match their columns."
+
+    @classmethod
+    def from_intervals(cls, interval_lists, columns, vocabulary):
+        """One column per interval list, e.g. the pattern of every day of the week."""
+        codes_of = {activity: code for code, activity in enumerate(vocabulary)}
+        runs = [interval_runs(intervals, codes_of) for intervals in interval_lists]
+        return cls([bounds for bounds, _ in runs], [codes for _, codes in runs], vocabulary, columns)
+
+    @property
+    def nbytes(self):
+        return sum(bounds.nbytes + codes.nbytes for bounds, codes in zip(self.bounds, self.codes))
+
+    def runs(self, columns=None):
+        """Yield (column index, start minute, end minute, activity) of every run, or of the runs of some column indices."""
+        for column in range(len(self.columns)) if columns is None else columns:
+            bounds, codes = self.bounds[column], self.codes[column]
+            for start, end, code in zip(bounds[:-1].tolist(), bounds[1:].tolist(), codes.tolist()):
+                yield column, start, end, self.vocabulary[code]
+
+    def rasterize(self, slot_minutes=30, rule="majority"):
+        """(slots, columns) code grid at any slot size that divides a day.
+
+        rule picks the activity of a slot holding several: "majority" (most minutes, earliest on a tie), "start"
+        (at the start of the slot) or "floor" (at its end, like rounding every boundary down to its slot
+        as the 30-minute grid does).
+        """
+        slots = slots_per_day(slot_minutes)
+        grid = np.zeros((slots, len(self.columns)), dtype=code_dtype(self.vocabulary))
+        slot_starts = np.arange(slots) * slot_minutes
+
+        for column, (bounds, codes) in enumerate(zip(self.bounds, self.codes)):
+            bounds = bounds.astype(np.int32)
+            if rule == "start":
+                grid[:, column] = codes[np.searchsorted(bounds, slot_starts, side='right') - 1]
+            elif rule == "floor":
+                grid[:, column] = codes[np.searchsorted(bounds, slot_starts + slot_minutes - 1, side='right') - 1]
+            elif rule == "majority":
+                # Minutes of every run in every slot it touches, summed per (slot, code)
+                first = bounds[:-1] // slot_minutes
+                last = (bounds[1:] - 1) // slot_minutes
+                run = np.repeat(np.arange(len(codes)), last - first + 1)
+                slot = np.concatenate([np.arange(a, b + 1) for a, b in zip(first, last)])
+                minutes = np.minimum(bounds[1:][run], (slot + 1) * slot_minutes) - np.maximum(bounds[:-1][run], slot * slot_minutes)
+                totals = np.zeros((slots, len(self.vocabulary)), dtype=np.int32)
+                np.add.at(totals, (slot, codes[run]), minutes)
+                # argmax takes the lowest code on a tie; take the earliest run in the slot instead
+                best = totals.max(axis=1)
+                order = np.full((slots, len(self.vocabulary)), np.iinfo(np.int32).max, dtype=np.int32)
+                np.minimum.at(order, (slot, codes[run]), run)
+                order[totals < best[:, None]] = np.iinfo(np.int32).max
+                grid[:, column] = order.argmin(axis=1)
+            else:
+                raise AssertionError(f"Error: Unknown rasterize rule '{rule}'.")
+        return grid
+
+    def to_compact(self, slot_minutes=30, rule="majority"):
+        """CompactSchedule at a slot size, with HH:MM labels for the slots."""
+        labels = [f"{minute // 60:02}:{minute % 60:02}" for minute in range(0, MINUTES_PER_DAY, slot_minutes)]
+        return CompactSchedule(self.rasterize(slot_minutes, rule), self.vocabulary, self.columns, labels)
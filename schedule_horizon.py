@@ -0,0 +1,145 @@
+"""Multi-week schedules: classify a dated list of workdays and stream the schedule out one week at a time."""
+import argparse
+import csv
+import datetime
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from config_cache import compile_config
+from schedule_raster import DAY_CATEGORIES, SLOT_MINUTES, TIME_SLOTS, classify_days, decode, rasterize
+
+HorizonWeek = namedtuple("HorizonWeek", ["dates", "categories", "codes", "vocabulary"])
+
+
+class HorizonScheduler:
+    def __init__(self, config_path, start, weeks, workdates=None, slot_minutes=SLOT_MINUTES, rotation=None):
+        """Schedule of `weeks` weeks from `start`. Without workdates, the weekday-name lists of rotation are worked one
+        week after the other, or the config's workdays repeat every week.
+
+        slot_minutes=1 keeps the exact interval times, e.g. for calendar export; the CSV and JSON sinks want 30-minute slots.
+        """
+        compiled = compile_config(config_path)
+        self.config = compiled.config
+
+        self.start = start
+        self.weeks = weeks
+        if workdates is None:
+            # A rotation is looked up per date, so nothing is stored for every week of the horizon
+            self.workdates = None
+            self.rotation = [set(workdays) for workdays in rotation or [self.config['workdays']]]
+        else:
+            self.workdates = set(workdates)
+            self.rotation = None
+
+        self.vocabulary = compiled.vocabulary
+        if slot_minutes == SLOT_MINUTES:
+            self.pattern_codes = np.array([compiled.pattern_codes[title] for title in DAY_CATEGORIES])
+        else:
+            patterns = {schedule['title']: schedule['intervals'] for schedule in self.config['schedule_patterns']}
+            self.pattern_codes = rasterize([patterns[title] for title in DAY_CATEGORIES], self.vocabulary, slot_minutes)
+
+    def is_work(self, first, days):
+        """Work/off array for `days` days from `first`."""
+        dates = [first + datetime.timedelta(days=i) for i in range(days)]
+        if self.workdates is not None:
+            return np.array([date in self.workdates for date in dates])
+        return np.array([date.strftime("%A") in self.rotation[(date - self.start).days // 7 % len(self.rotation)] for date in dates])
+
+    def iter_weeks(self):
+        """Yield the schedule one HorizonWeek at a time, so memory does not grow with the horizon."""
+        for week in range(self.weeks):
+            first = self.start + datetime.timedelta(days=week * 7)
+            dates = [first + datetime.timedelta(days=i) for i in range(7)]
+
+            # One day of halo on each side; the horizon edges fall back to the config's week-night flags
+            halo = self.is_work(first - datetime.timedelta(days=1), 9)
+            prev_night = halo[0] if week > 0 else self.config.get('prev_week_night', False)
+            next_night = halo[-1] if week < self.weeks - 1 else self.config.get('next_week_night', False)
+
+            categories = classify_days(halo[1:-1], prev_night, next_night)
+            yield HorizonWeek(dates, [DAY_CATEGORIES[c] for c in categories], self.pattern_codes[categories], self.vocabulary)
+
+    def stream(self, *sinks):
+        """Write every week to each sink, then close them."""
+        for week in self.iter_weeks():
+            for sink in sinks:
+                sink.write_week(week)
+        for sink in sinks:
+            sink.close()
+
+
+class CsvSink:
+    def __init__(self, filename):
+        """One CSV row per day: date, weekday, day category and one column per time slot."""
+        self.filename = filename
+        self.file = open(filename, 'w', encoding='UTF-8', newline='')
+        self.writer = csv.writer(self.file, lineterminator=os.linesep)
+        self.writer.writerow(["date", "day", "category"] + TIME_SLOTS)
+
+    def write_week(self, week):
+        assert week.codes.shape[1] == len(TIME_SLOTS), "Error: CSV export needs 30-minute slots."
+        for date, category, activities in zip(week.dates, week.categories, decode(week.codes, week.vocabulary)):
+            self.writer.writerow([date.isoformat(), date.strftime("%A"), category] + activities)
+
+    def close(self):
+        self.file.close()
+        print(f'Saved horizon schedule to CSV at {self.filename}.')
+
+
+class JsonLinesSink:
+    def __init__(self, filename):
+        """One JSON object per day, with the activity of every time slot."""
+        self.filename = filename
+        self.file = open(filename, 'w', encoding='UTF-8')
+
+    def write_week(self, week):
+        assert week.codes.shape[1] == len(TIME_SLOTS), "Error: JSON lines export needs 30-minute slots."
+        for date, category, activities in zip(week.dates, week.categories, decode(week.codes, week.vocabulary)):
+            self.file.write(json.dumps({"date": date.isoformat(), "category": category, "activities": activities}) + "\n")
+
+    def close(self):
+        self.file.close()
+        print(f'Saved horizon schedule to JSON lines at {self.filename}.')
+
+
+def load_workdates(path):
+    """Read ISO dates, one per line."""
+    with open(path, 'r', encoding='UTF-8') as f:
+        return [datetime.date.fromisoformat(line.strip()) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("config", help="config JSON with the six day category patterns")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--weeks", type=int, required=True, help="number of weeks to schedule")
+    dates = parser.add_mutually_exclusive_group()
+    dates.add_argument("--workdates", help="file with one workdate (YYYY-MM-DD) per line")
+    dates.add_argument("--rotation", help="JSON list of weekday-name lists, used one week after the other")
+    parser.add_argument("-o", "--output", default="results/horizon-schedule.csv", help=".csv, .jsonl or .ics output")
+    args = parser.parse_args(argv)
+
+    workdates, rotation = None, None
+    if args.workdates:
+        workdates = load_workdates(args.workdates)
+    elif args.rotation:
+        with open(args.rotation, 'r', encoding='UTF-8') as f:
+            rotation = json.load(f)
+
+    if args.output.endswith(".ics"):
+        from ics_export import IcsSink
+
+        # Calendar events keep the exact minutes of the intervals
+        scheduler = HorizonScheduler(args.config, args.start, args.weeks, workdates, slot_minutes=1, rotation=rotation)
+        sink = IcsSink(args.output, scheduler.config['colors'])
+    else:
+        scheduler = HorizonScheduler(args.config, args.start, args.weeks, workdates, rotation=rotation)
+        sink = JsonLinesSink(args.output) if args.output.endswith(".jsonl") else CsvSink(args.output)
+    scheduler.stream(sink)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+
+EMPTY = "empty"
+MINUTES_PER_DAY = 1440
+SLOT_MINUTES = 30
+
+DAYS_OF_WEEK = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DAY_CATEGORIES = [
+    "Night shift (Night-Any)",
+    "Night shift (Off-Any)",
+    "Off day (Night-Night)",
+    "Off day (Night-Off)",
+    "Off day (Off-Night)",
+    "Off day (Off-Off)",
+]
+TIME_SLOTS = [f"{h:02}:{m:02}" for h in range(24) for m in (0, 30)]
+
+
+def time_to_minutes(time):
+    """Convert a time string (HHMM) to minutes after midnight."""
+    return int(time[:2]) * 60 + int(time[2:])
+
+
+def slots_per_day(slot_minutes=SLOT_MINUTES):
+    """Number of slots in one day for the given slot size."""
+    assert MINUTES_PER_DAY % slot_minutes == 0, "Error: Slot size must divide a day evenly."
+    return MINUTES_PER_DAY // slot_minutes
+
+
+def classify_days(is_work, prev_night=False, next_night=False):
+    """Classify every day of a (..., days) work/off array into DAY_CATEGORIES indices in one pass.
+
+    prev_night and next_night are the work nights just outside the array, per row if given as arrays.
+    """
+    is_work = np.asarray(is_work, dtype=bool)
+    edge_shape = is_work.shape[:-1] + (1,)
+    prev_edge = np.broadcast_to(np.expand_dims(prev_night, -1), edge_shape)
+    next_edge = np.broadcast_to(np.expand_dims(next_night, -1), edge_shape)
+    prev_work = np.concatenate([prev_edge, is_work[..., :-1]], axis=-1)
+    next_work = np.concatenate([is_work[..., 1:], next_edge], axis=-1)
+
+    # Work days only depend on the night before, off days on both neighbours
+    work_category = np.where(prev_work, 0, 1)
+    off_category = 2 + 2 * ~prev_work + ~next_work
+    return np.where(is_work, work_category, off_category).astype(np.int8)
+
+
+def build_vocabulary(interval_lists, colors=None):
+    """Build the activity vocabulary. "empty" is always code 0, then colors, then any other ids."""
+    vocabulary = dict.fromkeys([EMPTY])
+    vocabulary.update(dict.fromkeys(colors or {}))
+    for intervals in interval_lists:
+        vocabulary.update(dict.fromkeys(interval["id"] for interval in intervals))
+    return list(vocabulary)
+
+
+def code_dtype(vocabulary):
+    """Smallest integer type able to hold every code of the vocabulary."""
+    return np.int8 if len(vocabulary) <= np.iinfo(np.int8).max else np.int16
+
+
+def rasterize(interval_lists, vocabulary, slot_minutes=SLOT_MINUTES):
+    """Rasterize many interval lists into one (n, slots) array of activity codes in a single pass.
+
+    Times are rounded down to their slot, later intervals in a list overwrite earlier ones,
+    and an interval that does not end after it starts wraps past midnight.
+    """
+    slots = slots_per_day(slot_minutes)
+    dtype = code_dtype(vocabulary)
+    grid = np.zeros((len(interval_lists), slots), dtype=dtype)
+
+    rows, cols, hhmm, ids = [], [], [], []
+    for row, intervals in enumerate(interval_lists):
+        for col, interval in enumerate(intervals):
+            rows.append(row)
+            cols.append(col)
+            hhmm.append(int(interval["start"]))
+            hhmm.append(int(interval["end"]))
+            ids.append(interval["id"])
+    if not ids:
+        return grid
+
+    codes_of = {activity: code for code, activity in enumerate(vocabulary)}
+    hhmm = np.array(hhmm, dtype=np.int32).reshape(-1, 2)
+    start_minute, end_minute = (hhmm // 100 * 60 + hhmm % 100).T
+    start, end = start_minute // slot_minutes, end_minute // slot_minutes
+
+    # Padding keeps length 0; an interval with end <= start wraps past midnight (a full day if equal).
+    # Wrapping is decided on the exact minutes, so an interval within one slot does not become a full day.
+    width = max(cols) + 1
+    starts = np.zeros((len(interval_lists), width), dtype=np.int32)
+    lengths = np.zeros_like(starts)
+    codes = np.zeros(starts.shape, dtype=dtype)
+    starts[rows, cols] = start
+    lengths[rows, cols] = np.where(end_minute > start_minute, end - start, end - start + slots)
+    codes[rows, cols] = [codes_of[activity] for activity in ids]
+
+    # Paint interval column by column so later intervals win, vectorized across all rows.
+    # Comparisons instead of a modulo for the wrapped part keep this cheap at 1-minute slots.
+    slot_index = np.arange(slots, dtype=np.int32)
+    ends = starts + lengths
+    for col in range(width):
+        start, end = starts[:, col, None], ends[:, col, None]
+        covered = ((slot_index >= start) & (slot_index < end)) | (slot_index < end - slots)
+        np.copyto(grid, codes[:, col, None], where=covered)
+
+    return grid
+
+
+def decode(grid, vocabulary):
+    """Convert an array of activity codes back into nested lists of activity ids."""
+    return np.asarray(vocabulary, dtype=object)[grid].tolist()
+
+
+def find_runs(grid):
+    """Runs of identical codes along each row of a 2-D code array, as (rows, starts, ends, codes)."""
+    grid = np.asarray(grid)
+    change = np.ones(grid.shape, dtype=bool)
+    change[:, 1:] = grid[:, 1:] != grid[:, :-1]
+    rows, starts = np.nonzero(change)
+
+    # A run ends where the next one starts, or at the end of its row
+    ends = np.full_like(starts, grid.shape[1])
+    same_row = rows[1:] == rows[:-1]
+    ends[:-1][same_row] = starts[1:][same_row]
+    return rows, starts, ends, grid[rows, starts]
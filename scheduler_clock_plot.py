@@ -1,14 +1,27 @@
-import json
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
 from re import sub
 
+import render_cache
+from config_cache import compile_config
+from tracing import enable_from_argv, span, traced
+
 
 class SchedulePlotter:
-    def __init__(self, save_image=False, schedule_data=None):
-        """Initialize the SchedulePlotter with optional schedule data."""
+    def __init__(self, save_image=False, schedule_data=None, output_dir='results', show=True, figure=None):
+        """Initialize the SchedulePlotter with optional schedule data.
+
+        With a figure given, clock plots are drawn into it instead of a pyplot window.
+        """
         self.save_image = save_image
         self.schedule_data = schedule_data
+        self.output_dir = output_dir
+        self.show = show
+        self.figure = figure
+        self.max_radius = 1.4
+        self.clock_face = None
+        self.schedule_artists = []
 
     @staticmethod
     def snake_case(s):
@@ -44,17 +57,82 @@ class SchedulePlotter:
 
         return f"{dur_h}h{dur_m:02d}m"
 
+    def get_clock_face(self):
+        """Build the static clock face once and reuse it for every schedule."""
+        import matplotlib.pyplot as plt
+
+        if self.clock_face is not None and (self.figure is not None or plt.fignum_exists(self.clock_face[0].number)):
+            return self.clock_face
+
+        with span("clock.face"):
+            if self.figure is None:
+                fig = plt.figure(figsize=(8, 8), facecolor='darkgrey')
+            else:
+                fig = self.figure
+                fig.clear()
+            ax = fig.add_subplot(projection='polar')
+
+            ax.set_theta_direction(-1)           # Clockwise
+            ax.set_theta_offset(np.pi/2)         # 0 (midnight) at the top
+            ax.set_xticklabels([])               # Remove degree (theta) axis labels
+
+            # Plot hour labels and ticks, all ticks as one NaN-separated line
+            tick_inner = 1.17
+            tick_outer = 1.25
+            hour_angles = np.array([self.time_to_angle(f"{hour:02d}00") for hour in range(24)])
+            ax.plot(np.repeat(hour_angles, 3), np.tile([tick_inner, tick_outer, np.nan], 24), color='black', lw=2)
+            for hour, angle in enumerate(hour_angles):
+                ax.text(angle, tick_outer + 0.05, f"{hour:02d}", ha='center', va='center', fontsize=8)
+
+            ax.set_yticklabels([])
+            ax.set_ylim(0, self.max_radius)
+
+        self.clock_face = (fig, ax)
+        self.schedule_artists = []
+        return self.clock_face
+
+    def clear_schedule(self):
+        """Remove the artists of the previous schedule from the clock face."""
+        for artist in self.schedule_artists:
+            artist.remove()
+        self.schedule_artists = []
+
+    def close(self):
+        """Close the cached clock face figure."""
+        if self.clock_face is not None and self.figure is None:
+            import matplotlib.pyplot as plt
+
+            plt.close(self.clock_face[0])
+        self.clock_face = None
+
+    @traced("clock.plot_schedule")
     def plot_schedule(self, title, schedule):
-        """Plot a clock plot for the given schedule."""
-        fig, ax = plt.subplots(subplot_kw={'projection': 'polar'}, figsize=(8, 8), facecolor='darkgrey')
+        """Plot a clock plot for the given schedule. A saved image that is already in the render cache is not drawn again."""
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import Wedge
+
+        cached = False
+        if self.save_image:
+            filename = os.path.join(self.output_dir, f"{self.snake_case(title)}.png")
+            cached = render_cache.fetch(self.render_key(title, schedule, render_cache.image_format(filename)), filename)
+            # Without a window or preview figure to fill, a cached image is all that is needed
+            if cached and not self.show and self.figure is None:
+                print(f'Saved clock plot to PNG at {filename}.')
+                return
 
-        ax.set_theta_direction(-1)           # Clockwise
-        ax.set_theta_offset(np.pi/2)         # 0 (midnight) at the top
-        ax.set_xticklabels([])               # Remove degree (theta) axis labels
+        fig, ax = self.get_clock_face()
+        self.clear_schedule()
 
         arc_radius = 1
         arc_thickness = 36
-                
+
+        # Wedges live in axes coordinates, where the clock is a circle of radius 0.5 around (0.5, 0.5)
+        points_per_radius = ax.get_position().height * fig.get_figheight() * 72 / 2 / self.max_radius
+        arc_width = arc_thickness / points_per_radius
+        to_axes = 0.5 / self.max_radius
+
+        wedges = []
         for interval in schedule:
             # Set the beginning and end arc angles based on the time
             start_angle = self.time_to_angle(interval["start"])
@@ -64,29 +142,32 @@ class SchedulePlotter:
             if end_angle <= start_angle:
                 end_angle += 2 * np.pi
 
-            # Arc calculations
-            theta = np.linspace(start_angle, end_angle, 200)
-            r = np.full_like(theta, arc_radius)
-            
-            ax.plot(theta, r, color=self.colors[interval["id"]], linewidth=arc_thickness, solid_capstyle='butt', label=interval["id"])
+            # Clockwise from the top is counterclockwise from the right, so the end angle comes first
+            wedges.append(Wedge((0.5, 0.5), (arc_radius + arc_width / 2) * to_axes,
+                                90 - np.degrees(end_angle), 90 - np.degrees(start_angle), width=arc_width * to_axes))
 
             # Calculate middle angle for labelling
             mid_angle = (start_angle + end_angle) / 2.0 % (2 * np.pi)
             text_rot = (270 - np.degrees(mid_angle)) % 360
-            
+
             # Flip if on left half for readability
             if 90 <= text_rot <= 270:
                 text_rot += 180
 
             # Place activity label
-            ax.text(mid_angle, arc_radius, interval["id"], ha='center', va='center',
-                    fontsize=10, color='white', 
-                    bbox=dict(facecolor=self.colors[interval["id"]], edgecolor='white', boxstyle='round,pad=0.2'))
+            self.schedule_artists.append(ax.text(mid_angle, arc_radius, interval["id"], ha='center', va='center',
+                                                 fontsize=10, color='white',
+                                                 bbox=dict(facecolor=self.colors[interval["id"]], edgecolor='white', boxstyle='round,pad=0.2')))
 
             # Place duration label
-            ax.text(mid_angle, arc_radius - 0.30, self.duration_str(interval), ha='center', va='center',
-                    fontsize=8, color='white', rotation=text_rot, 
-                    bbox=dict(facecolor="grey", edgecolor='none', boxstyle='round,pad=0.2'))
+            self.schedule_artists.append(ax.text(mid_angle, arc_radius - 0.30, self.duration_str(interval), ha='center', va='center',
+                                                 fontsize=8, color='white', rotation=text_rot,
+                                                 bbox=dict(facecolor="grey", edgecolor='none', boxstyle='round,pad=0.2')))
+
+        arcs = PatchCollection(wedges, facecolors=[self.colors[interval["id"]] for interval in schedule], edgecolors='none',
+                               transform=ax.transAxes, zorder=2.5)
+        ax.add_collection(arcs, autolim=False)
+        self.schedule_artists.append(arcs)
 
         # Plot intersection labels
         marker_times = set()
@@ -94,50 +175,51 @@ class SchedulePlotter:
             marker_times.add(interval["start"])
             marker_times.add(interval["end"])
 
-        intersection_radius = 1.15
-        for time_str in sorted(marker_times):
-            # If on an hour mark, skip to be plotted as a tick later
-            if int(time_str[2:]) == 0:
-                continue
+        # If on an hour mark, skip to be plotted as a tick
+        marker_times = [time_str for time_str in sorted(marker_times) if int(time_str[2:]) != 0]
 
-            angle = self.time_to_angle(time_str)
+        intersection_radius = 1.15
+        marker_angles = [self.time_to_angle(time_str) for time_str in marker_times]
+        self.schedule_artists.extend(ax.plot(marker_angles, [intersection_radius + 0.05] * len(marker_angles), linestyle='none',
+                                             marker='o', markersize=4, color='black', alpha=1))
+        for time_str, angle in zip(marker_times, marker_angles):
             text_rot = (270 - np.degrees(angle)) % 360
             if 90 <= text_rot <= 270:
                 text_rot += 180
 
             time_str = time_str[:2] + ':' + time_str[2:]
-            ax.plot(angle, intersection_radius + 0.05, marker='o', markersize=4, color='black', alpha=1)
-            ax.text(angle, intersection_radius + 0.15, time_str, rotation=text_rot, ha='center', va='center',
-                    fontsize=8, color="black",
-                    bbox=dict(facecolor="none", edgecolor='none', boxstyle='round,pad=0.2'))
-
-        # Plot hour labels and ticks
-        tick_inner = 1.17
-        tick_outer = 1.25
-        for hour in range(24):
-            angle = self.time_to_angle(f"{hour:02d}00")
-            ax.plot([angle, angle], [tick_inner, tick_outer], color='black', lw=2)
-            ax.text(angle, tick_outer + 0.05, f"{hour:02d}", ha='center', va='center', fontsize=8)
-
-        ax.set_yticklabels([])
-        ax.set_ylim(0, 1.4)
-        plt.title(title, fontsize=14)
+            self.schedule_artists.append(ax.text(angle, intersection_radius + 0.15, time_str, rotation=text_rot, ha='center', va='center',
+                                                 fontsize=8, color="black",
+                                                 bbox=dict(facecolor="none", edgecolor='none', boxstyle='round,pad=0.2')))
+
+        ax.set_title(title, fontsize=14)
 
         # Save image if set, then plot
         if self.save_image:
-            filename = f"results/{self.snake_case(title)}.png"
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
+            if not cached:
+                render_cache.prepare(filename)
+                with span("clock.savefig", dpi=300):
+                    fig.savefig(filename, dpi=300, bbox_inches='tight')
+                render_cache.store(self.render_key(title, schedule, render_cache.image_format(filename)), filename)
             print(f'Saved clock plot to PNG at {filename}.')
-            
-        plt.show()
 
+        if self.show and self.figure is None:
+            plt.show()
+
+    def render_key(self, title, schedule, fmt="png"):
+        """Render cache key of one clock plot saved in an image format."""
+        figsize = (8, 8) if self.figure is None else tuple(self.figure.get_size_inches())
+        colors = {interval["id"]: self.colors[interval["id"]] for interval in schedule}
+        return render_cache.render_key("clock", fmt, title=title, intervals=schedule, colors=colors, dpi=300,
+                                       bbox_inches='tight', figsize=figsize, max_radius=self.max_radius)
+
+    @traced("clock.load_config")
     def load_schedule_data(self, file_path):
         """Load schedule data from a JSON file."""
-        with open(file_path, 'r', encoding='UTF-8') as f:
-            config_data = json.load(f)
-            self.schedule_data = {schedule['title']: schedule['intervals'] for schedule in config_data['schedule_patterns']}
-            
-            self.colors = config_data["colors"]
+        config_data = compile_config(file_path).config
+        self.schedule_data = {schedule['title']: schedule['intervals'] for schedule in config_data['schedule_patterns']}
+
+        self.colors = config_data["colors"]
 
     def plot_all_schedules(self):
         """Plot all schedules."""
@@ -153,6 +235,7 @@ class SchedulePlotter:
             self.plot_schedule(schedule_title, self.schedule_data[schedule_title])
 
 if __name__ == "__main__":
+    enable_from_argv(sys.argv)
     plotter = SchedulePlotter(True)
     plotter.load_schedule_data(file_path='config-files/example-config.json')
     plotter.plot_one_schedule('Night shift (Night-Any)')
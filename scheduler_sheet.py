@@ -1,97 +1,54 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import json
+import sys
+
+import render_cache
+from compact_schedule import CompactSchedule
+from config_cache import classify_week, compile_config, compile_config_data
+from run_schedule import RunSchedule
+from schedule_raster import DAYS_OF_WEEK, TIME_SLOTS, build_vocabulary, decode, find_runs, rasterize
+from tracing import enable_from_argv, span, traced
 
 class SheetScheduler:
     def __init__(self, config_path='config.json'):
         self.config_path = config_path
-        self.time_slots = [f"{h:02}:{m:02}" for h in range(24) for m in (0, 30)]
-        self.days_of_week = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-        self.config = self.load_config()
-        self.schedule_patterns = self.generate_schedule_patterns()
-        self.day_categories = {day: self.get_day_category(day) for day in self.days_of_week}
-        self.schedule = pd.DataFrame({day: self.schedule_patterns[self.day_categories[day]] for day in self.days_of_week}, index=self.time_slots)
+        self.time_slots = list(TIME_SLOTS)
+        self.days_of_week = list(DAYS_OF_WEEK)
+        # Patterns and day categories come precomputed from the compiled config cache
+        with span("sheet.load_config", path=self.config_path):
+            compiled = compile_config(self.config_path)
+        self.config = compiled.config
+        self.schedule_patterns = compiled.schedule_patterns
+        self.day_categories = compiled.day_categories
         self.activity_colors = self.get_activity_colors()
+        self.vocabulary = compiled.vocabulary
+        self.sheet_axes = None
+        self.exact = False
+        self._schedule = None
+
+    @property
+    def schedule(self):
+        """The weekly schedule as a DataFrame with categorical columns. Built on first use, so pandas is only loaded then."""
+        if self._schedule is None:
+            with span("sheet.build_dataframe"):
+                self._schedule = self.to_compact().to_dataframe()
+        return self._schedule
 
     def load_config(self):
-        """Load configuration from a JSON file."""
-        with open(self.config_path, 'r', encoding='UTF-8') as f:
-            config = json.load(f)
-        assert config, "Error: config.json not found."
-        return config
+        """Load configuration from a JSON file, through the compiled config cache."""
+        return compile_config(self.config_path).config
 
     def generate_activity_list(self, intervals):
         """Create a 48-slot activity list based on defined intervals."""
-        def time_to_index(time):
-            hours, minutes = int(time[:2]), int(time[2:])
-            return (hours * 60 + minutes) // 30
-
-        activity_list = ["empty"] * 48
-
-        for interval in intervals:
-            start_index = time_to_index(interval["start"])
-            end_index = time_to_index(interval["end"])
-
-            if end_index <= start_index:
-                end_index += 48
-
-            for i in range(start_index, end_index):
-                activity_list[i % 48] = interval["id"]
-
-        return activity_list
+        vocabulary = build_vocabulary([intervals])
+        return decode(rasterize([intervals], vocabulary), vocabulary)[0]
 
     def generate_schedule_patterns(self):
-        """Generate schedule patterns from the configuration."""
-        patterns = {
-            schedule['title']: self.generate_activity_list(schedule['intervals'])
-            for schedule in self.config['schedule_patterns']
-        }
-        assert all(len(pattern) == 48 for pattern in patterns.values()), "Error: Incorrect pattern length."
-        return patterns
+        """Generate schedule patterns from the configuration. They are precompiled; this returns a copy."""
+        return {title: list(pattern) for title, pattern in self.schedule_patterns.items()}
 
     def get_day_category(self, day):
         """Determine the category of a given day based on workdays and transitions."""
-        # If a work day
-        if day in self.config['workdays']:
-            previous_day = {
-                "Monday": "Sunday",
-                "Tuesday": "Monday",
-                "Wednesday": "Tuesday",
-                "Thursday": "Wednesday",
-                "Friday": "Thursday",
-                "Saturday": "Friday",
-                "Sunday": "prev_week_night"  # Special case for Sunday
-            }
-
-            # Determine if the previous "work night" applies
-            if previous_day[day] == "prev_week_night":
-                previous_work_night = self.config.get("prev_week_night", False)
-            else:
-                previous_work_night = previous_day[day] in self.config['workdays']
-
-            if previous_work_night:
-                return "Night shift (Night-Any)"
-            else:
-                return "Night shift (Off-Any)"
-
-        # If a day off
-        else:
-            day_idx = self.days_of_week.index(day)
-            prev_day = self.days_of_week[day_idx - 1]
-            next_day = self.days_of_week[(day_idx + 1) % 7]
-
-            prev_night = self.config['prev_week_night'] if day == "Sunday" else prev_day in self.config['workdays']
-            next_night = self.config['next_week_night'] if day == "Saturday" else next_day in self.config['workdays']
-
-            if prev_night and next_night:
-                return "Off day (Night-Night)"
-            elif prev_night:
-                return "Off day (Night-Off)"
-            elif next_night:
-                return "Off day (Off-Night)"
-            else:
-                return "Off day (Off-Off)"
+        return classify_week(self.config)[day]
 
     def get_activity_colors(self):
         """Extract activity colors from the configuration."""
@@ -101,63 +58,287 @@ class SheetScheduler:
         """Print the generated schedule."""
         print(self.schedule)
 
-    def save_to_csv(self, filename="results/schedule-sheet.csv"):
-        """Save the schedule to a CSV file."""
-        self.schedule.to_csv(filename)
+    def save_to_csv(self, filename="results/schedule-sheet.csv", slot_minutes=None, rule="majority"):
+        """Save the schedule to a CSV file. With slot_minutes, it is rasterized from the exact times at that slot size."""
+        with span("sheet.save_csv", slot_minutes=slot_minutes):
+            if slot_minutes is None:
+                self.to_compact().to_csv(filename)
+            else:
+                self.to_runs().to_compact(slot_minutes, rule).to_csv(filename)
         print(f'Saved schedule sheet to CSV at {filename}.')
 
-    def save_to_png(self, filename="results/schedule-sheet.png"):
+    def to_compact(self):
+        """Compact int8 code grid of the schedule, sharing the activity vocabulary from the config colors."""
+        if self._schedule is not None:
+            return CompactSchedule.from_dataframe(self._schedule)
+        return CompactSchedule.from_columns({day: self.schedule_patterns[self.day_categories[day]] for day in self.days_of_week},
+                                            self.vocabulary, self.time_slots)
+
+    def to_runs(self):
+        """Run-length schedule of the week, exact to the minute, straight from the config intervals."""
+        patterns = {schedule['title']: schedule['intervals'] for schedule in self.config['schedule_patterns']}
+        return RunSchedule.from_intervals([patterns[self.day_categories[day]] for day in self.days_of_week],
+                                          self.days_of_week, self.vocabulary)
+
+    def save_to_npz(self, filename="results/schedule-sheet.npz"):
+        """Save the compact schedule to a binary NPZ file."""
+        self.to_compact().save_npz(filename)
+        print(f'Saved schedule sheet to NPZ at {filename}.')
+
+    def save_to_png(self, filename="results/schedule-sheet.png", fig=None, exact=False):
         """Save the plotted schedule to a PNG file."""
-        self.plot_schedule(save_path=filename)
+        self.plot_schedule(save_path=filename, fig=fig, exact=exact)
         print(f'Saved schedule sheet to PNG at {filename}.')
 
-    def plot_schedule(self, save_path=None):
-        """Visualize the schedule using a heatmap."""
-        plt.figure(figsize=(12, 8), facecolor='darkgrey')
+    def plot_schedule(self, save_path=None, fast=False, fig=None, exact=False):
+        """Visualize the schedule using a heatmap. fast draws the same sheet from a handful of batched artists.
+        exact places every activity at its configured minute instead of on the 30-minute slots.
 
-        for day_idx, day in enumerate(self.days_of_week):
-            current_activity = None
-            start_time = 0
-
-            for time_idx, activity in enumerate(self.schedule[day]):
-                if activity != current_activity:
-                    if current_activity is not None:
-                        plt.fill_between([day_idx, day_idx + 1], start_time, time_idx, color=self.activity_colors[current_activity])
-                        plt.text(day_idx + 0.5, (start_time + time_idx) / 2, current_activity, ha="center", va="center", fontsize=12, color="white",
-                                 bbox=dict(facecolor=self.activity_colors[current_activity], edgecolor='none', boxstyle='round,pad=0.11'))
-                    current_activity = activity
-                    start_time = time_idx
-
-            plt.fill_between([day_idx, day_idx + 1.5], start_time, len(self.time_slots), color=self.activity_colors[current_activity])
-            plt.text(day_idx + 0.5, (start_time + len(self.time_slots)) / 2, current_activity, ha="center", va="center", fontsize=12, color="white",
-                     bbox=dict(facecolor=self.activity_colors[current_activity], edgecolor='none', boxstyle='round,pad=0.2'))
+        With a figure given, it is drawn (and saved) without touching pyplot, so it is safe off the main thread.
+        A saved image found in the render cache is linked into place instead; without a figure given, nothing is drawn
+        then and None is returned.
+        """
+        cached = False
+        if save_path:
+            key = self.render_key(fast, (12, 8) if fig is None else tuple(fig.get_size_inches()), exact,
+                                  render_cache.image_format(save_path))
+            cached = render_cache.fetch(key, save_path)
+            if cached and fig is None:
+                return None
+
+        own_figure = fig is None
+        if own_figure:
+            import matplotlib.pyplot as plt
+
+            fig = plt.figure(figsize=(12, 8), facecolor='darkgrey')
+        with span("sheet.draw", fast=fast, exact=exact):
+            self.draw_schedule(fig, fast, exact)
+
+        if save_path:
+            if not cached:
+                render_cache.prepare(save_path)
+                with span("sheet.savefig", dpi=300):
+                    fig.savefig(save_path, dpi=300, bbox_inches='tight')
+                render_cache.store(key, save_path)
+            if own_figure:
+                plt.close(fig)
+        elif own_figure:
+            plt.show()
+        return fig
+
+    def render_key(self, fast, figsize, exact=False, fmt="png"):
+        """Render cache key of the schedule sheet saved in an image format."""
+        compact = self.to_compact()
+        colors = {activity: self.activity_colors[activity] for activity in compact.vocabulary if activity in self.activity_colors}
+        # The exact sheet is drawn from the runs, which the 30-minute codes do not capture
+        runs = list(self.to_runs().runs()) if exact else None
+        return render_cache.render_key("sheet", fmt, codes=compact.codes.tolist(), vocabulary=compact.vocabulary,
+                                       categories=[self.day_categories[day] for day in self.days_of_week],
+                                       colors=colors, title="Night Shift Weekly Schedule", dpi=300, bbox_inches='tight',
+                                       figsize=figsize, fast=fast, exact=exact, runs=runs)
+
+    def draw_schedule(self, fig, fast=False, exact=False):
+        """Draw the schedule sheet onto a cleared figure."""
+        fig.clear()
+        ax = fig.subplots()
+        self.sheet_axes = ax
+        self.activity_blocks = None
+        self.exact = exact
+
+        if fast:
+            self.day_artists = self.draw_activity_grid(ax)
+        else:
+            self.day_artists = self.draw_activity_runs(ax)
 
         # Add day category labels
+        self.category_labels = {}
         for day_idx, day in enumerate(self.days_of_week):
-            plt.text(day_idx + 0.5, -0.7, self.day_categories[day], color="black", ha="center", fontsize=7, fontweight="bold")
+            self.category_labels[day] = ax.text(day_idx + 0.5, -0.7, self.day_categories[day], color="black", ha="center", fontsize=7, fontweight="bold")
 
-        plt.yticks(np.arange(len(self.time_slots)), self.time_slots, fontsize=8)
-        plt.xticks(np.arange(7) + 0.5, self.days_of_week)
-        plt.gca().invert_yaxis()
+        ax.set_yticks(np.arange(len(self.time_slots)), self.time_slots, fontsize=8)
+        ax.set_xticks(np.arange(7) + 0.5, self.days_of_week)
+        ax.invert_yaxis()
 
-        for x in range(1, 7):
-            plt.axvline(x, color='black', linewidth=2)
+        if fast:
+            self.draw_grid_lines(ax)
+        else:
+            for x in range(1, 7):
+                ax.axvline(x, color='black', linewidth=2)
 
-        for y in range(len(self.time_slots)):
-            plt.axhline(y, color='black', linestyle='dotted', linewidth=0.5)
+            for y in range(len(self.time_slots)):
+                ax.axhline(y, color='black', linestyle='dotted', linewidth=0.5)
 
-        for y in range(0, len(self.time_slots), 2):
-            plt.axhline(y, color='black', linewidth=1)
+            for y in range(0, len(self.time_slots), 2):
+                ax.axhline(y, color='black', linewidth=1)
 
-        plt.gca().set_xlim(0, 7)
-        plt.ylim(len(self.time_slots), -2)  # Add white row at the top
-        plt.title("Night Shift Weekly Schedule")
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        ax.set_xlim(0, 7)
+        ax.set_ylim(len(self.time_slots), -2)  # Add white row at the top
+        ax.set_title("Night Shift Weekly Schedule")
+        return ax
+
+    def sheet_runs(self):
+        """(day index, start, end, activity) of every activity run, with start and end in 30-minute slots.
+
+        Exact runs start and end at fractions of a slot.
+        """
+        if self.exact:
+            return [(day_idx, start / 30, end / 30, activity) for day_idx, start, end, activity in self.to_runs().runs()]
+        compact = self.to_compact()
+        rows, starts, ends, codes = find_runs(compact.codes.T)
+        return [(day_idx, start, end, compact.vocabulary[code])
+                for day_idx, start, end, code in zip(rows.tolist(), starts.tolist(), ends.tolist(), codes.tolist())]
+
+    def draw_activity_runs(self, ax, days=None):
+        """Draw one filled block and one label per activity run. Returns the artists of each drawn day."""
+        day_artists = {}
+        runs = self.sheet_runs()
+        for i, (day_idx, start, end, activity) in enumerate(runs):
+            day = self.days_of_week[day_idx]
+            if days is not None and day not in days:
+                continue
+            # The last run of a day keeps its slightly larger label box
+            last = i == len(runs) - 1 or runs[i + 1][0] != day_idx
+            artists = day_artists.setdefault(day, [])
+            artists.append(ax.fill_between([day_idx, day_idx + 1], start, end, color=self.activity_colors[activity]))
+            artists.append(ax.text(day_idx + 0.5, (start + end) / 2, activity, ha="center", va="center", fontsize=12, color="white",
+                                   bbox=dict(facecolor=self.activity_colors[activity], edgecolor='none',
+                                             boxstyle='round,pad=0.2' if last else 'round,pad=0.11')))
+        return day_artists
+
+    def draw_activity_grid(self, ax, days=None):
+        """Draw the whole 7x48 sheet as a single PolyCollection with one rectangle per activity run.
+
+        The collection is reused on later calls; only the labels of the given days are redrawn.
+        """
+        from matplotlib.collections import PolyCollection
+
+        runs = self.sheet_runs()
+
+        blocks = [[(day_idx, start), (day_idx + 1, start), (day_idx + 1, end), (day_idx, end)] for day_idx, start, end, _ in runs]
+        facecolors = [self.activity_colors[activity] for *_, activity in runs]
+        if self.activity_blocks is None:
+            self.activity_blocks = PolyCollection(blocks, facecolors=facecolors, edgecolors='face', linewidths=0.5, zorder=1)
+            ax.add_collection(self.activity_blocks)
         else:
-            plt.show()
+            self.activity_blocks.set_verts(blocks)
+            self.activity_blocks.set_facecolor(facecolors)
+            self.activity_blocks.set_edgecolor('face')
+
+        # Label boxes hide the grid lines behind the text, as in the per-run drawing
+        day_artists = {}
+        for i, (day_idx, start, end, activity) in enumerate(runs):
+            day = self.days_of_week[day_idx]
+            if days is not None and day not in days:
+                continue
+            last = i == len(runs) - 1 or runs[i + 1][0] != day_idx
+            day_artists.setdefault(day, []).append(
+                ax.text(day_idx + 0.5, (start + end) / 2, activity, ha="center", va="center", fontsize=12, color="white",
+                        bbox=dict(facecolor=self.activity_colors[activity], edgecolor='none',
+                                  boxstyle='round,pad=0.2' if last else 'round,pad=0.11')))
+        return day_artists
+
+    @traced("sheet.redraw_days")
+    def redraw_days(self, days):
+        """Redraw only the given day columns of the last drawn sheet."""
+        ax = self.sheet_axes
+        for day in days:
+            for artist in self.day_artists.pop(day, []):
+                artist.remove()
+            self.category_labels[day].set_text(self.day_categories[day])
+
+        if self.activity_blocks is not None:
+            self.day_artists.update(self.draw_activity_grid(ax, days))
+        else:
+            self.day_artists.update(self.draw_activity_runs(ax, days))
+        ax.figure.canvas.draw_idle()
+
+    @traced("sheet.update_workdays")
+    def update_workdays(self, workdays, prev_week_night=None, next_week_night=None):
+        """Change the workdays and recompute only the days they can affect. Returns the days whose schedule changed.
+
+        A day's category only depends on itself and its two neighbours, so only those are reclassified;
+        if a sheet has been drawn, just the changed columns are redrawn.
+        """
+        toggled = set(workdays) ^ set(self.config['workdays'])
+        if prev_week_night is not None and prev_week_night != self.config.get('prev_week_night', False):
+            toggled.add(self.days_of_week[0])
+        if next_week_night is not None and next_week_night != self.config.get('next_week_night', False):
+            toggled.add(self.days_of_week[-1])
+
+        # Update our own copy of the config
+        self.config['workdays'] = [day for day in self.days_of_week if day in workdays]
+        if prev_week_night is not None:
+            self.config['prev_week_night'] = prev_week_night
+        if next_week_night is not None:
+            self.config['next_week_night'] = next_week_night
+
+        dirty = set()
+        for day in toggled:
+            day_idx = self.days_of_week.index(day)
+            dirty.update(self.days_of_week[max(day_idx - 1, 0):day_idx + 2])
+
+        categories = classify_week(self.config)
+        changed = []
+        for day in self.days_of_week:
+            if day not in dirty:
+                continue
+            category = categories[day]
+            if category != self.day_categories[day]:
+                self.day_categories[day] = category
+                changed.append(day)
+
+        # The DataFrame view is rebuilt from the new categories on next use
+        if changed:
+            self._schedule = None
+
+        if changed and self.sheet_axes is not None:
+            self.redraw_days(changed)
+        return changed
+
+    @traced("sheet.update_config")
+    def update_config(self, config):
+        """Apply an edited config and recompute only the days it affects. Returns the days whose schedule changed.
+
+        Days are redrawn when their category changes with the work week, or when the intervals or colors of their pattern change.
+        """
+        compiled = compile_config_data(config)
+        old_patterns = {schedule['title']: schedule['intervals'] for schedule in self.config['schedule_patterns']}
+        old_colors = self.activity_colors
+
+        # Take everything but the work week, which update_workdays compares against the old one
+        week_keys = ("workdays", "prev_week_night", "next_week_night")
+        self.config = dict(compiled.config, **{key: self.config.get(key, False) for key in week_keys})
+        self.schedule_patterns = compiled.schedule_patterns
+        self.vocabulary = compiled.vocabulary
+        self.activity_colors = self.get_activity_colors()
+        self._schedule = None
+        changed = self.update_workdays(config['workdays'], config.get('prev_week_night', False), config.get('next_week_night', False))
+
+        patterns = {schedule['title']: schedule['intervals'] for schedule in self.config['schedule_patterns']}
+        edited = []
+        for day in self.days_of_week:
+            intervals = patterns[self.day_categories[day]]
+            if day not in changed and (intervals != old_patterns.get(self.day_categories[day]) or any(
+                    self.activity_colors[interval["id"]] != old_colors.get(interval["id"]) for interval in intervals)):
+                edited.append(day)
+        if edited and self.sheet_axes is not None:
+            self.redraw_days(edited)
+        return [day for day in self.days_of_week if day in changed or day in edited]
+
+    def draw_grid_lines(self, ax):
+        """Draw the day separators and the half-hour and hour lines as one LineCollection."""
+        from matplotlib.collections import LineCollection
+
+        slots = len(self.time_slots)
+        segments = [[(x, -2), (x, slots)] for x in range(1, 7)]
+        segments += [[(0, y), (7, y)] for y in range(slots)]
+        segments += [[(0, y), (7, y)] for y in range(0, slots, 2)]
+        linewidths = [2] * 6 + [0.5] * slots + [1] * len(range(0, slots, 2))
+        linestyles = ['solid'] * 6 + ['dotted'] * slots + ['solid'] * len(range(0, slots, 2))
+        ax.add_collection(LineCollection(segments, colors='black', linewidths=linewidths, linestyles=linestyles))
 
 if __name__ == "__main__":
+    enable_from_argv(sys.argv)
     scheduler = SheetScheduler('config-files/example-config.json')
     scheduler.display_schedule()
     scheduler.plot_schedule()
@@ -0,0 +1,135 @@
+"""Team coverage: how many people are at work, commuting, asleep... in every 30-minute slot of the week."""
+import argparse
+import csv
+import json
+import os
+from itertools import islice
+
+import numpy as np
+
+from batch_render import find_configs
+from schedule_raster import DAY_CATEGORIES, DAYS_OF_WEEK, SLOT_MINUTES, TIME_SLOTS, build_vocabulary, classify_days, rasterize
+
+
+def load_configs(config_paths):
+    """Yield the parsed config files one at a time."""
+    for path in config_paths:
+        with open(path, 'r', encoding='UTF-8') as f:
+            yield json.load(f)
+
+
+def encode_week(configs, vocabulary, slot_minutes=SLOT_MINUTES):
+    """Encode the weekly schedule of many configs as one (n, 7, 48) array of activity codes (more slots for smaller slot_minutes)."""
+    interval_lists = []
+    for config in configs:
+        patterns = {schedule['title']: schedule['intervals'] for schedule in config['schedule_patterns']}
+        assert all(title in patterns for title in DAY_CATEGORIES), "Error: Missing day category pattern."
+        interval_lists.extend(patterns[title] for title in DAY_CATEGORIES)
+    pattern_codes = rasterize(interval_lists, vocabulary, slot_minutes).reshape(len(configs), len(DAY_CATEGORIES), -1)
+
+    is_work = np.array([[day in config['workdays'] for day in DAYS_OF_WEEK] for config in configs], dtype=bool).reshape(-1, 7)
+    prev_night = np.array([config.get('prev_week_night', False) for config in configs], dtype=bool)
+    next_night = np.array([config.get('next_week_night', False) for config in configs], dtype=bool)
+    categories = classify_days(is_work, prev_night, next_night)
+
+    return pattern_codes[np.arange(len(configs))[:, None], categories]
+
+
+def count_coverage(configs, vocabulary=None, chunk_size=1000):
+    """Reduce many configs into a (7, 48, activities) array of head counts, chunk_size configs at a time.
+
+    Returns (counts, vocabulary). Activities missing from the vocabulary are appended as they are found.
+    """
+    vocabulary = list(vocabulary or build_vocabulary([]))
+    counts = np.zeros((len(DAYS_OF_WEEK), len(TIME_SLOTS), len(vocabulary)), dtype=np.int64)
+    configs = iter(configs)
+
+    while chunk := list(islice(configs, chunk_size)):
+        # Grow the vocabulary (and the count array with it) for any new activity in this chunk
+        interval_lists = [schedule['intervals'] for config in chunk for schedule in config['schedule_patterns']]
+        vocabulary = build_vocabulary(interval_lists, dict.fromkeys(vocabulary))
+        if len(vocabulary) > counts.shape[2]:
+            counts = np.pad(counts, ((0, 0), (0, 0), (0, len(vocabulary) - counts.shape[2])))
+
+        # Every (day, slot, activity) triple gets one bin, so a single bincount counts the whole chunk
+        codes = encode_week(chunk, vocabulary)
+        cells = np.arange(len(DAYS_OF_WEEK) * len(TIME_SLOTS)).reshape(1, len(DAYS_OF_WEEK), len(TIME_SLOTS))
+        counts += np.bincount((cells * len(vocabulary) + codes).ravel(), minlength=counts.size).reshape(counts.shape)
+
+    return counts, vocabulary
+
+
+def save_coverage_csv(counts, vocabulary, filename="results/coverage.csv"):
+    """Save one row per day and time slot with the head count of every activity."""
+    with open(filename, 'w', encoding='UTF-8', newline='') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(["day", "time"] + vocabulary)
+        for day_idx, day in enumerate(DAYS_OF_WEEK):
+            for time_idx, time_slot in enumerate(TIME_SLOTS):
+                writer.writerow([day, time_slot] + counts[day_idx, time_idx].tolist())
+    print(f'Saved coverage counts to CSV at {filename}.')
+
+
+def plot_coverage(counts, vocabulary, colors, activities=None, save_path=None):
+    """Visualize the head counts as one weekly heatmap per activity, in the style of the schedule sheet."""
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LinearSegmentedColormap
+
+    unknown = [activity for activity in activities or [] if activity not in vocabulary]
+    assert not unknown, f"Error: Unknown activities: {', '.join(unknown)}. The configs have: {', '.join(vocabulary)}."
+    activities = activities or [activity for activity in vocabulary if activity != "empty" and counts[..., vocabulary.index(activity)].any()]
+    if not activities:
+        print('Nothing to plot, no activity has any head counts.')
+        return
+    fig, axes = plt.subplots(1, len(activities), figsize=(6 * len(activities), 8), facecolor='darkgrey',
+                             squeeze=False, layout='constrained')
+
+    for ax, activity in zip(axes[0], activities):
+        cmap = LinearSegmentedColormap.from_list(activity, ["#FFFFFF", colors.get(activity, "black")])
+        image = ax.imshow(counts[..., vocabulary.index(activity)].T, cmap=cmap, vmin=0, interpolation='nearest',
+                          extent=(0, 7, len(TIME_SLOTS), 0), aspect='auto')
+        fig.colorbar(image, ax=ax, fraction=0.05, pad=0.02, label="people")
+
+        ax.set_yticks(np.arange(0, len(TIME_SLOTS), 2), TIME_SLOTS[::2], fontsize=8)
+        ax.set_xticks(np.arange(7) + 0.5, [day[:3] for day in DAYS_OF_WEEK])
+        for x in range(1, 7):
+            ax.axvline(x, color='black', linewidth=2)
+        for y in range(0, len(TIME_SLOTS), 2):
+            ax.axhline(y, color='black', linewidth=0.5)
+
+        ax.set_xlim(0, 7)
+        ax.set_ylim(len(TIME_SLOTS), 0)
+        ax.set_title(f"Team Coverage: {activity}")
+
+    if save_path:
+        fig.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+        print(f'Saved coverage heatmap to PNG at {save_path}.')
+    else:
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="+", help="config directories, config files or manifests")
+    parser.add_argument("-o", "--output", default="results/coverage.png", help="heatmap PNG")
+    parser.add_argument("--csv", default=None, help="also save the counts to this CSV")
+    parser.add_argument("--activities", nargs="+", default=None, help="activities to plot (default: all present)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="configs encoded per chunk")
+    args = parser.parse_args(argv)
+
+    config_paths = find_configs(args.sources)
+    assert config_paths, "Error: No config files found."
+
+    # Heatmap colors come from the first config
+    colors = next(load_configs(config_paths[:1]))['colors']
+    counts, vocabulary = count_coverage(load_configs(config_paths), build_vocabulary([], colors), args.chunk_size)
+    print(f'Counted {len(config_paths)} schedules.')
+
+    if args.csv:
+        save_coverage_csv(counts, vocabulary, args.csv)
+    plot_coverage(counts, vocabulary, colors, args.activities, save_path=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Optional tracing spans around the render stages.
+
+Set SCHEDULE_TRACE=trace.json (or pass --trace trace.json to a script) to record every span into a Chrome
+trace-event file, which chrome://tracing and Perfetto can open, and print cumulative time per stage at exit.
+While tracing is off, span() hands back one shared no-op context manager.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "SCHEDULE_TRACE"
+# Pid of the process that writes the trace file; worker processes only record
+OWNER_ENV = "SCHEDULE_TRACE_OWNER"
+
+_events = None
+_thread_names = {}
+_trace_path = None
+_owner_pid = None
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def enabled():
+    return _events is not None
+
+
+def span(name, **args):
+    """Context manager timing one stage. Names are 'area.stage', e.g. 'sheet.savefig'."""
+    if _events is None:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+def traced(name):
+    """Decorator wrapping every call of a function in a span."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, start_ns, duration_ns, args=None):
+    """Add one complete event. list.append is atomic, so worker threads need no lock."""
+    if _events is None:
+        return
+    thread = threading.current_thread()
+    if thread.ident not in _thread_names:
+        _thread_names[thread.ident] = thread.name
+    _events.append({"name": name, "cat": name.split(".")[0], "ph": "X", "ts": start_ns / 1000, "dur": duration_ns / 1000,
+                    "pid": os.getpid(), "tid": thread.ident, "args": args or {}})
+
+
+def enable(path=None):
+    """Start recording. With a path, the trace is saved and summarized when the process exits."""
+    global _events, _trace_path, _owner_pid
+    if _events is None:
+        _events = []
+    if path and _trace_path is None:
+        _trace_path = path
+        _owner_pid = int(os.environ.get(OWNER_ENV, os.getpid()))
+        # Spawned worker processes pick these up on import and record into their own event list
+        os.environ[TRACE_ENV] = path
+        os.environ[OWNER_ENV] = str(_owner_pid)
+        atexit.register(_finish)
+
+
+def disable():
+    global _events
+    _events = None
+
+
+def enable_from_argv(argv):
+    """Enable tracing if argv has '--trace PATH', removing the flag so the rest of argv is left as it was."""
+    if "--trace" in argv:
+        i = argv.index("--trace")
+        assert i + 1 < len(argv), "Error: --trace needs an output path."
+        enable(argv[i + 1])
+        del argv[i:i + 2]
+    return argv
+
+
+def take_events():
+    """Return and forget the events recorded so far, e.g. to send them from a worker process to the parent."""
+    if _events is None:
+        return []
+    events = _events[:]
+    del _events[:len(events)]
+    return events
+
+
+def add_events(events):
+    """Merge events recorded in another process."""
+    if _events is not None:
+        _events.extend(events)
+
+
+def summary():
+    """Rows of (stage, calls, total ms, mean ms, max ms), slowest total first. Nested spans count in their parents too."""
+    stages = {}
+    for event in _events or []:
+        stage = stages.setdefault(event["name"], [0, 0.0, 0.0])
+        stage[0] += 1
+        stage[1] += event["dur"] / 1000
+        stage[2] = max(stage[2], event["dur"] / 1000)
+    rows = [(name, calls, total, total / calls, longest) for name, (calls, total, longest) in stages.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def print_summary():
+    print(f"{'stage':40} {'calls':>7} {'total ms':>11} {'mean ms':>10} {'max ms':>10}")
+    for name, calls, total, mean, longest in summary():
+        print(f"{name:40} {calls:7} {total:11.1f} {mean:10.2f} {longest:10.2f}")
+
+
+def save(path):
+    """Write the recorded events as Chrome trace-event JSON."""
+    events = list(_events or [])
+    pids = {event["pid"] for event in events}
+    metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in _thread_names.items()]
+    metadata += [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "main" if pid == os.getpid() else f"worker {pid}"}}
+                 for pid in pids]
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='UTF-8') as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    print(f'Saved trace to JSON at {path}.')
+
+
+def _finish():
+    if _events is None or os.getpid() != _owner_pid:
+        return
+    save(_trace_path)
+    print_summary()
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
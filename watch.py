@@ -0,0 +1,178 @@
+"""Watch config files and re-render only what an edit changes: the clock plots of changed patterns and the affected sheet columns."""
+import argparse
+import os
+import sys
+import time
+
+from config_cache import compile_config
+import tracing
+from tracing import span
+
+WEEK_KEYS = ("workdays", "prev_week_night", "next_week_night")
+
+
+def file_signature(path):
+    """(mtime, size) of a file, or None while it is missing (e.g. in the middle of an editor's atomic save)."""
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return status.st_mtime_ns, status.st_size
+
+
+def diff_configs(old, new):
+    """(changed pattern titles, changed activity colors, whether the work week changed) between two parsed configs."""
+    old_patterns = {schedule['title']: schedule['intervals'] for schedule in old['schedule_patterns']}
+    new_patterns = {schedule['title']: schedule['intervals'] for schedule in new['schedule_patterns']}
+    titles = {title for title in old_patterns.keys() | new_patterns.keys() if old_patterns.get(title) != new_patterns.get(title)}
+    colors = {activity for activity in old['colors'].keys() | new['colors'].keys() if old['colors'].get(activity) != new['colors'].get(activity)}
+    week = any(old.get(key, False) != new.get(key, False) for key in WEEK_KEYS)
+    return titles, colors, week
+
+
+class ConfigWatch:
+    def __init__(self, config_path, output_dir="results/watch", exact=False):
+        """Renders of one config file, kept alive between edits so only the changed parts are drawn again."""
+        self.config_path = config_path
+        self.output_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(config_path))[0])
+        self.sheet_path = os.path.join(self.output_dir, "schedule-sheet.png")
+        self.exact = exact
+        self.signature = None
+        self.config = None
+        self.scheduler = None
+        self.plotter = None
+        self.figure = None
+
+    def render(self):
+        """Render whatever changed since the last call (everything on the first) and print the timing of the cycle."""
+        from scheduler_clock_plot import SchedulePlotter
+
+        name = os.path.basename(self.config_path)
+        timings = {}
+        cycle_start = time.perf_counter()
+
+        with span("watch.cycle", path=self.config_path):
+            stage_start = time.perf_counter()
+            try:
+                config = compile_config(self.config_path).config
+            except (OSError, ValueError, AssertionError, KeyError, TypeError) as e:
+                # Most likely saved halfway; the next save is picked up again
+                print(f'{name}: not rendered, the config is invalid ({type(e).__name__}: {e}).')
+                return
+            timings["load"] = time.perf_counter() - stage_start
+
+            patterns = {schedule['title']: schedule['intervals'] for schedule in config['schedule_patterns']}
+            if self.config is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                titles, colors, week = set(patterns), set(config['colors']), True
+            else:
+                titles, colors, week = diff_configs(self.config, config)
+            if not (titles or colors or week):
+                print(f'{name}: no changes to render.')
+                self.config = config
+                return
+
+            # Clock plots: patterns that changed, and patterns using an activity whose color changed
+            stage_start = time.perf_counter()
+            clock_titles = [title for title, intervals in patterns.items()
+                            if title in titles or any(interval["id"] in colors for interval in intervals)]
+            if self.plotter is None:
+                self.plotter = SchedulePlotter(True, output_dir=self.output_dir, show=False)
+            self.plotter.schedule_data = patterns
+            self.plotter.colors = config['colors']
+            for title in clock_titles:
+                self.plotter.plot_schedule(title, patterns[title])
+            timings["clock"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            sheet_days = self.render_sheet(config)
+            timings["sheet"] = time.perf_counter() - stage_start
+            self.config = config
+
+            # Clock plots of patterns that are gone would otherwise linger in the output folder
+            removed = sorted(titles - patterns.keys())
+            for title in removed:
+                try:
+                    os.remove(os.path.join(self.output_dir, f"{SchedulePlotter.snake_case(title)}.png"))
+                except FileNotFoundError:
+                    pass
+
+        columns = "all" if len(sheet_days) == 7 else ", ".join(sheet_days) or "none"
+        print(f'{name}: {len(clock_titles)} clock plot(s), sheet columns: {columns}'
+              + (f', removed: {", ".join(removed)}' if removed else '')
+              + f' in {(time.perf_counter() - cycle_start) * 1000:.0f} ms ('
+              + ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items()) + ').')
+
+    def render_sheet(self, config):
+        """Redraw the sheet columns an edit affects and save the sheet. Returns the redrawn days."""
+        import render_cache
+        from matplotlib.figure import Figure
+        from scheduler_sheet import SheetScheduler
+
+        if self.scheduler is None:
+            self.scheduler = SheetScheduler(self.config_path)
+            self.figure = Figure(figsize=(12, 8), facecolor='darkgrey')
+            self.scheduler.save_to_png(self.sheet_path, fig=self.figure, exact=self.exact)
+            return list(self.scheduler.days_of_week)
+
+        days = self.scheduler.update_config(config)
+        if days:
+            render_cache.prepare(self.sheet_path)
+            with span("sheet.savefig", dpi=300):
+                self.figure.savefig(self.sheet_path, dpi=300, bbox_inches='tight')
+            print(f'Saved schedule sheet to PNG at {self.sheet_path}.')
+        return days
+
+
+def watch(config_paths, output_dir="results/watch", interval=0.5, debounce=0.5, exact=False):
+    """Render every config, then poll them every interval seconds and re-render the ones that changed.
+
+    A change is rendered once the file has stayed the same for debounce seconds, so a burst of saves is one cycle.
+    """
+    watches = [ConfigWatch(path, output_dir, exact) for path in config_paths]
+    for config_watch in watches:
+        config_watch.signature = file_signature(config_watch.config_path)
+        config_watch.render()
+    print(f'Watching {len(watches)} config file(s), press Ctrl+C to stop.', flush=True)
+
+    # Config watch -> (signature last seen, when it was first seen)
+    pending = {}
+    while True:
+        time.sleep(interval)
+        now = time.monotonic()
+        for config_watch in watches:
+            signature = file_signature(config_watch.config_path)
+            if signature is None or signature == config_watch.signature:
+                pending.pop(config_watch, None)
+            elif pending.get(config_watch, (None,))[0] != signature:
+                # Changed (again): restart the debounce
+                pending[config_watch] = (signature, now)
+            elif now - pending[config_watch][1] >= debounce:
+                del pending[config_watch]
+                config_watch.signature = signature
+                config_watch.render()
+                sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("configs", nargs="+", help="config files to watch")
+    parser.add_argument("-o", "--output", default="results/watch", help="one folder of PNGs per config in here")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls")
+    parser.add_argument("--debounce", type=float, default=0.5, help="seconds a file must stay unchanged before rendering")
+    parser.add_argument("--exact", action="store_true", help="draw the sheet at the exact minutes")
+    parser.add_argument("--trace", default=None, help="write a Chrome trace of the cycles on exit")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        tracing.enable(args.trace)
+    # Renders go to files only; no window may open
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    try:
+        watch(args.configs, args.output, args.interval, args.debounce, args.exact)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()